@@ -1,3 +1,4 @@
+import hashlib
 import os
 
 class BotConfig:
@@ -11,10 +12,50 @@ class BotConfig:
         self.SECRET: str = self.loader(self.SECRET_FILE).strip()
         self.BASE_URL: str = self.get_baseurl()
         self.TIMEOUT: float = 60 # long polling
-        self.LIMIT: float = 2 # telegram limit every minute we can send 30 message
+        self.UPDATE_WORKERS: int = 8 # chats handled in parallel
+        self.HANDLED_RETENTION: float = 24 * 60 * 60 # seconds handled update_ids are kept (re-deliveries are ignored)
+
+        # Updates: "polling" (getUpdates, deletes a registered webhook first)
+        # or "webhook" (Telegram POSTs to WEBHOOK_URL, HTTPS only)
+        self.UPDATE_MODE: str = "polling"
+        self.WEBHOOK_URL: str = "" # public https URL registered with setWebhook, "" = register it yourself
+        self.WEBHOOK_HOST: str = "0.0.0.0"
+        self.WEBHOOK_PORT: int = 8443 # Telegram delivers to ports 443, 80, 88 and 8443 only
+        self.WEBHOOK_CERT: str = "" # PEM certificate (chain) trusted by Telegram, "" = plain HTTP behind a TLS reverse proxy
+        self.WEBHOOK_KEY: str = "" # PEM private key, "" = it is in WEBHOOK_CERT
+        self.WEBHOOK_PATH: str = "/telegram"
+        self.WEBHOOK_SECRET: str = hashlib.sha256(f"webhook:{self.SECRET}".encode("utf-8")).hexdigest() # X-Telegram-Bot-Api-Secret-Token
+
+        # Snapshots (informations TABLE)
+        self.SNAPSHOT_STORAGE: str = "delta" # "full" | "delta"
+        self.KEYFRAME_INTERVAL: int = 50 # full copy every N snapshots in delta storage
+        self.INCREMENTAL_EXTRACTION: bool = True # keep a per-program index (programs TABLE)
+
+        # HTTP client
+        self.CONNECT_TIMEOUT: float = 5
+        self.READ_TIMEOUT: float = 15
+        self.POOL_SIZE: int = 32 # keep-alive connections to api.telegram.org
+
+        # Broadcast
+        self.GLOBAL_RATE: float = 30 # messages per second, all chats
+        self.GLOBAL_BURST: float = 1 # tokens the global bucket may bank
+        self.PER_CHAT_RATE: float = 1 # messages per second, one chat
+        self.MAX_IN_FLIGHT: int = 16 # concurrent sendMessage requests
+        self.RETRY_BASE_DELAY: float = 1
+        self.RETRY_MAX_DELAY: float = 60
+        self.BROADCAST_INTERVAL: float = 60 * 60 # seconds between scheduled broadcasts, 0 = only on /new
+
+        # Outbox (every outgoing message goes through the outbox TABLE)
+        self.OUTBOX_BATCH: int = 500 # rows sent per engine run
+        self.OUTBOX_EXPAND_BATCH: int = 1000 # broadcast recipients added to the outbox per transaction
+        self.OUTBOX_LEASE: float = 5 * 60 # seconds a claimed batch is reserved for its worker (> time to send OUTBOX_BATCH)
+        self.OUTBOX_MAX_ATTEMPTS: int = 10 # deliveries before a row is marked failed (429 / 5xx / network errors are retried)
+        self.OUTBOX_POLL_INTERVAL: float = 30 # seconds, safety net besides notify()
+        self.OUTBOX_RETENTION: float = 7 * 24 * 60 * 60 # seconds sent rows are kept (idempotency window)
 
         # UI
         self.WHEN_no_auth_replay = "You must subscribe to use this robot."
+        self.STATUS_PAGE_SIZE: int = 50 # users per /status <page>
 
     def loader(self, file: str) -> str:
         with open(file, "r", encoding="utf-8") as f:
@@ -1,13 +1,35 @@
+import os
+
 class BrowserConfig:
     def __init__(self):
+        self.project_root: str = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
         self.base_url = self.get_base_url()
         self.timeout = 15
         self.max_retries = 3
         self.retry_delay = 5
-        self.rate_limit = 1
+        self.requests_per_second = 1 # cap for page requests, all workers together (same rate as the old rate_limit)
+        self.max_workers = 4 # pages fetched in parallel
+        self.use_http_cache = True # ETag / Last-Modified revalidation of pages
+        self.cache_dir = os.path.join(self.project_root, "instance", "http_cache")
+
+        # browser fallback (one persistent headless Chromium, see get_data_browser.py)
+        self.browser_headless = True
+        self.browser_entry_url = None # web page that loads the API page, "{page}" is filled in; None = open the API URL itself
+        self.browser_block_resources = ("image", "font", "stylesheet", "media") # never downloaded
         self.fields = self.get_fields()
+
+        # incremental extraction (DataExtractor with an index)
+        self.identity_field = "title" # program identity, key of fields
+        self.version_field = "last_update_at" # moves when a program changes
+        self.sorted_by_update = False # True only if base_url sorts by last_update_at, newest first
         self.validation_rules = self.get_validation_rules()
 
+        # pages failing validation are captured here (sampled, async, rotated)
+        self.invalid_log_dir = os.path.join(self.project_root, "logs")
+        self.invalid_log_max_files = 20 # older captures are deleted
+        self.invalid_log_max_bytes = 256 * 1024 # bigger payloads are stored truncated
+        self.invalid_log_interval = 60 # seconds, at most one capture per interval
+
     def get_base_url(self):
         return "https://api.yeswehack.com/programs?page=3&resultsPerPage=42&filter%5Btype%5D%5B%5D=bug-bounty"
         """
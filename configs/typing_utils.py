@@ -1,5 +1,6 @@
 from dataclasses import dataclass
-from typing import List, Optional, Protocol
+from enum import IntFlag
+from typing import Any, Dict, List, Optional, Protocol, Tuple, Union
 
 class CommandMethod(Protocol):
     def __call__(self, id: int, chat_id: int, timestamp: str, flags: str, text: str) -> Optional[str]: ...
@@ -7,4 +8,36 @@ class CommandMethod(Protocol):
 @dataclass
 class Command:
     keywords: List[str]
-    method: CommandMethod
\ No newline at end of file
+    method: CommandMethod
+
+# identity -> (last_update_at, active, row values in fields order), in snapshot order
+ProgramEntries = Dict[Any, Tuple[Any, bool, tuple]]
+
+class ProgramIndex(Protocol):
+    """per-program state for incremental extraction (see models/programs.py)"""
+    def load(self) -> ProgramEntries: ...
+    def save(self, entries: ProgramEntries, complete: bool) -> None: ...
+
+class UserFlag(IntFlag):
+    """
+    bits of users.flag_mask
+    the legacy flags string is one char per bit, in this order: "<AUTH><REMOVED><ADDED><COMMON>"
+    """
+    AUTH = 1      # subscribed (/secret)
+    REMOVED = 2   # /removed
+    ADDED = 4     # /added
+    COMMON = 8    # /common
+    ALL = 15
+
+FLAG_ORDER = (UserFlag.AUTH, UserFlag.REMOVED, UserFlag.ADDED, UserFlag.COMMON)
+_MASK_TO_FLAGS = tuple("".join("1" if mask & bit else "0" for bit in FLAG_ORDER) for mask in range(16))
+
+def flags_to_mask(flags: Union[str, int]) -> int:
+    """ "1010" -> 5 (ints are returned as they are) """
+    if isinstance(flags, int):
+        return flags
+    return sum(int(bit) for bit, char in zip(FLAG_ORDER, flags) if char == "1")
+
+def mask_to_flags(mask: int) -> str:
+    """ 5 -> "1010" """
+    return _MASK_TO_FLAGS[mask & UserFlag.ALL]
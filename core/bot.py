@@ -3,18 +3,31 @@ import logging
 
 from models.users import UserManager
 from configs.bot_config import BotConfig
-from configs.typing_utils import Command
+from configs.typing_utils import Command, UserFlag, flags_to_mask, mask_to_flags
 from core.broadcast import Do_Broadcast
+from core.outbox import OutboxWorker
+from core.scheduler import JobScheduler, Progress
+from core.telegram_client import TelegramClient
 
 class TelegramBot:
     """BOT manager"""
     def __init__(self, 
                  config: BotConfig, 
-                 user_manager: UserManager):
+                 user_manager: UserManager,
+                 client: Optional[TelegramClient] = None,
+                 outbox: Optional[OutboxWorker] = None):
         self.logger = logging.getLogger(self.__class__.__name__)
 
         self.secret = config.SECRET
+        self.status_page_size = config.STATUS_PAGE_SIZE
         self.user_manager = user_manager
+        self.client = client
+        self.outbox = outbox
+        self.broadcaster: Optional[Do_Broadcast] = None  # kept across runs (caches the newest snapshot)
+        # extraction + broadcast run in the background, commands stay responsive
+        self.scheduler = JobScheduler(job=self.run_broadcast,
+                                      interval=config.BROADCAST_INTERVAL,
+                                      name="broadcast")
 
         self.CMD: List[Command] = [
             Command(keywords=["/secret", "/removed", "/added", "/common"], method=self.auth),
@@ -37,33 +50,58 @@ class TelegramBot:
         all_keywords = sorted(set(all_keywords))
         return "\n".join(all_keywords)
 
-    def new_command(self, id: int, chat_id: int, timestamp: str, flags: str, text: str) -> None:
-        self.logger.info("use: class Do_Broadcast in main")
-        broadcaster = Do_Broadcast()
-        broadcaster.run()
-        return None
+    def new_command(self, id: int, chat_id: int, timestamp: str, flags: str, text: str) -> str:
+        if self.scheduler.trigger():
+            self.logger.info("Broadcast queued by /new")
+            return "⏳ Broadcast started"
+        return f"⏳ Broadcast already in progress\n{self.scheduler.status()}"
+
+    def run_broadcast(self, progress: Progress):
+        """JobScheduler job, runs on the scheduler thread"""
+        if self.broadcaster is None:
+            self.broadcaster = Do_Broadcast(client=self.client, outbox=self.outbox)
+        self.broadcaster.run(progress=progress)
 
     def status_command(self, id: int, chat_id: int, timestamp: str, flags: str, text: str) -> str:
-        users = self.user_manager.get_all_users()
-        all_users = []
-        for user in users:
-            all_users.append(f"{user.id}:")
-            all_users.append(f"{user.chat_id}")
-            all_users.append(f"{user.flags}")
-            all_users.append(f"{user.timestamp}")
-        return "\n".join(all_users)
+        """
+        /status        : scheduler, outbox and users counted per flags
+        /status <page> : one page of users (STATUS_PAGE_SIZE per page)
+        """
+        page_size = self.status_page_size
+        counts = self.user_manager.count_by_mask()
+        total = sum(counts.values())
+        pages = max((total + page_size - 1) // page_size, 1)
+
+        args = text.split()[1:]
+        if args:
+            if not args[0].isdecimal() or not 1 <= int(args[0]) <= pages:
+                return f"❌ Page must be 1-{pages}"
+            page = int(args[0])
+            lines = [f"users page {page}/{pages}"]
+            for user in self.user_manager.get_page(page, page_size):
+                lines.append(f"{user.id}: {user.chat_id} {user.flags} {user.timestamp}")
+            return "\n".join(lines)
+
+        lines = [self.scheduler.status()]
+        if self.outbox is not None:
+            outbox_counts = self.outbox.outbox_manager.counts()
+            lines.append("outbox: " + ", ".join(f"{status} {outbox_counts.get(status, 0)}" for status in ("pending", "sending", "sent", "failed")))
+        lines.append(f"users: {total}")
+        for mask, count in sorted(counts.items()):
+            lines.append(f"{mask_to_flags(mask)}: {count}")
+        lines.append(f"pages: {pages} (/status <page>)")
+        return "\n".join(lines)
 
     def auth(self, id: int, chat_id: int, timestamp: str, flags: str, text: str) -> str:
-        updated_flags = list(flags)
+        mask = flags_to_mask(flags)
         if text == f"/secret:{self.secret}":
-            updated_flags = ['1', '1', '1', '1']
+            mask = UserFlag.ALL
         elif text.startswith("/removed"):
-            updated_flags[1] = '1' if updated_flags[1] == '0' else '0'
+            mask ^= UserFlag.REMOVED
         elif text.startswith("/added"):
-            updated_flags[2] = '1' if updated_flags[2] == '0' else '0'
+            mask ^= UserFlag.ADDED
         elif text.startswith("/common"):
-            updated_flags[3] = '1' if updated_flags[3] == '0' else '0'
+            mask ^= UserFlag.COMMON
 
-        new_flags = ''.join(updated_flags)
-        self.user_manager.update_flags(chat_id=chat_id, new_flags=new_flags)
-        return f"Flags updated to {new_flags}"
+        self.user_manager.update_mask(chat_id=chat_id, flag_mask=mask)
+        return f"Flags updated to {mask_to_flags(mask)}"
@@ -1,13 +1,18 @@
-from typing import Optional, Tuple, Callable
-import time
+from typing import Dict, List, Optional, Tuple, Union, Callable
 import datetime
-import requests
 import logging
+import uuid
 
 from models.db import DatabaseManager
 from models.informations import InformationDateManager
 from models.users import UserManager
+from models.programs import ProgramIndexManager
+from models.outbox import OutboxManager, PRIORITY_BROADCAST
 from configs.bot_config import BotConfig
+from configs.browser_config import BrowserConfig
+from configs.typing_utils import UserFlag, flags_to_mask, mask_to_flags
+from core.telegram_client import TelegramClient
+from core.outbox import OutboxWorker
 from views.diff_checker import diff_to_dict, build_message_custom
 from views.network_utils import split_message
 
@@ -18,115 +23,166 @@ class Do_Broadcast:
     def __init__(self, 
                  func: Callable = get_extracet, 
                  use_diff: bool = True, 
-                 auth: bool = True):
+                 auth: bool = True,
+                 client: Optional[TelegramClient] = None,
+                 diff_mode: str = "keyed",
+                 outbox: Optional[OutboxWorker] = None):
         """
         Initializes the Do_Broadcast with necessary configuration and dependencies.
 
         :param func: Callable function to fetch data (used in API interaction).
         :param use_diff: If True, messages are sent with diffs (changes) from the last data.
         :param auth: If True, only users with '1' as the first character in their flags will receive messages.
+        :param client: Shared pooled Telegram client (a new one is created if omitted).
+        :param diff_mode: "keyed" (by BrowserConfig.identity_field, reports changed rows) or "ndiff" (line diff).
+        :param outbox: Running outbox worker of the bot. If omitted, run() sends
+                       the queued messages itself before returning.
         """
         self.logger = logging.getLogger(self.__class__.__name__)  # Logger per class
         self.func = func  # Function to fetch data
         self.use_diff = use_diff  # Flag to determine if diffs should be used
         self.auth = auth  # Flag to enable filtering of users based on their flags
+        self.diff_mode = diff_mode
+        browser_config = BrowserConfig()
+        self.fields = list(browser_config.fields)  # CSV column order of the snapshot
+        self.identity_field = browser_config.identity_field  # row key of the keyed diff
 
         # Initialize settings and dependencies
         self.config = BotConfig()
         self.db_manager = DatabaseManager(self.config.DB_FILE)
         self.user_manager = UserManager(db_manager=self.db_manager)
-        self.information_manager = InformationDateManager(db_manager=self.db_manager)
-
-    def send_message(self, chat_id: int, text: str):
-        """
-        Sends a message to a user, splitting it if it's too long.
-
-        :param chat_id: Telegram chat ID of the recipient.
-        :param text: Message text to be sent.
-        """
-        messages = split_message(text)
-
-        for chunk in messages:
-            self._send_single_message(chat_id, chunk)
-
-    def _send_single_message(self, chat_id: int, text: str):
-        """
-        Sends a single part of the message to the specified user.
-
-        :param chat_id: Telegram chat ID of the recipient.
-        :param text: A single chunk of the message to be sent.
-        """
-        url = f"{self.config.BASE_URL}/sendMessage"
-        params = {'chat_id': chat_id, 'text': text}
-        try:
-            response = requests.get(url, params=params)
-            result = response.json()
-            if result.get("ok"):
-                self.logger.info(f"Message part sent successfully to chat_id {chat_id}.")
-            else:
-                error_description = result.get("description", "No error description provided.")
-                self.logger.error(f"Error sending message part to chat_id {chat_id}: {error_description}")
-        except requests.RequestException as e:
-            self.logger.error(f"Error sending message to chat_id {chat_id}: {e}")
-        time.sleep(self.config.LIMIT)
-
-    def process_auth(self, user_flags: str, data: str, last_data: str) -> str:
+        self.information_manager = InformationDateManager(db_manager=self.db_manager,
+                                                          storage=self.config.SNAPSHOT_STORAGE,
+                                                          keyframe_interval=self.config.KEYFRAME_INTERVAL)
+        self.program_index = ProgramIndexManager(db_manager=self.db_manager) if self.config.INCREMENTAL_EXTRACTION else None
+        self.client = client or TelegramClient(config=self.config)
+        self.outbox_manager = OutboxManager(db_manager=self.db_manager)
+        self.outbox = outbox or OutboxWorker(db_manager=self.db_manager, client=self.client, config=self.config)
+        self.drain_outbox = outbox is None  # standalone: nobody else drains it
+
+    def process_auth(self, user_flags: Union[int, str], data: str, last_data: str,
+                     diff_result: Optional[dict] = None) -> str:
         """
         Processes the message for each user, considering their flags and whether diffs should be used.
 
-        :param user_flags: Flags associated with the user (used for filtering).
+        :param user_flags: UserFlag mask of the user (or the legacy flags string).
         :param data: The current data to be sent.
         :param last_data: The previous data (used to calculate diffs).
+        :param diff_result: Precomputed diff_to_dict(data, last_data), computed here if omitted.
         :return: The message to be sent to the user.
         """
         if not self.auth:
             return data  # No authentication, send the data as it is
 
-        if user_flags.startswith("1"):
+        mask = flags_to_mask(user_flags)
+        if mask & UserFlag.AUTH:
             if self.use_diff:
-                diff_result = diff_to_dict(first=data, second=last_data)
-                return build_message_custom(user_data=user_flags, message=diff_result)
+                if diff_result is None:
+                    diff_result = self.diff(data, last_data)
+                return build_message_custom(user_data=mask, message=diff_result)
             else:
                 return data
         else:
-            return f"{len(data)}\n{user_flags}"  # For unauthorized users, send a summary
+            return f"{len(data)}\n{mask_to_flags(mask)}"  # For unauthorized users, send a summary
 
-    def send_broadcast(self, data: str, last_data: str = ""):
+    def diff(self, data: str, last_data: str) -> dict:
+        return diff_to_dict(first=data, second=last_data, mode=self.diff_mode,
+                            fields=self.fields, key=self.identity_field)
+
+    def send_broadcast(self, data: str, last_data: str = "", broadcast_id: Optional[str] = None,
+                       rendered: Optional[Dict[int, List[str]]] = None) -> int:
         """
-        Sends a broadcast message to all users, applying necessary filters based on flags.
+        Queues a broadcast message to all users in the outbox, applying necessary filters based on flags.
+
+        Only the rendered chunks (once per flag mask) and a marker are written here,
+        the outbox worker adds the per-user rows in small batches.
 
         :param data: The current data to be sent.
         :param last_data: The previous data (used for diff calculations if needed).
+        :param broadcast_id: Idempotency key, queueing the same broadcast twice sends it once.
+        :param rendered: Output of render_groups, rendered here if omitted.
+        :return: Number of message chunks queued.
         """
-        users = self.user_manager.get_all_users()
-        self.logger.info(f"Sending broadcast to {len(users)} users.")
+        # the message only depends on the flag mask: at most 16 audiences,
+        # each one read from idx_users_flag_mask
+        counts = self.user_manager.count_by_mask()
+        if rendered is None:
+            rendered = self.render_groups(sorted(counts), data, last_data)
 
-        for user in users:
-            self.logger.info(f"Preparing message for user chat_id: {user.chat_id}, flags: {user.flags}")
-            message = self.process_auth(user.flags, data, last_data)
-            self.send_message(user.chat_id, message)
-            time.sleep(self.config.LIMIT)
+        queued = 0
+        for mask, chunks in rendered.items():
+            self.logger.info(f"Preparing message for {counts.get(mask, 0)} users with flags: {mask_to_flags(mask)}")
+            queued += counts.get(mask, 0) * len(chunks)
+        self.logger.info(f"Sending broadcast to {sum(counts.get(mask, 0) for mask in rendered)} users.")
 
-    def update_information(self, data) -> Tuple[str, str]:
+        # delivered by the outbox worker (BroadcastEngine, paced by GLOBAL_RATE / PER_CHAT_RATE)
+        if not self.outbox_manager.queue_broadcast(broadcast_id or f"broadcast:{uuid.uuid4().hex}", rendered):
+            self.logger.info("Broadcast was already queued.")
+            return 0
+        return queued
+
+    def render_groups(self, flag_groups: List[int], data: str, last_data: str) -> Dict[int, List[str]]:
         """
-        Updates the database with the new data and retrieves the last data.
+        Renders and pre-splits the message once per flag group.
+        The diff is computed at most once per broadcast.
 
-        :param data: The current data to be saved into the database.
-        :return: A tuple of (new data, last data).
+        :param flag_groups: Distinct user flag masks.
+        :return: flag mask -> message chunks.
         """
+        diff_result = None
+        if self.auth and self.use_diff and any(mask & UserFlag.AUTH for mask in flag_groups):
+            diff_result = self.diff(data, last_data)
+
+        rendered = {}
+        for mask in flag_groups:
+            message = self.process_auth(mask, data, last_data, diff_result=diff_result)
+            rendered[mask] = split_message(message)
+        return rendered
+
+    def compare_information(self, data: Optional[str]) -> Tuple[str, str, Optional[tuple]]:
+        """
+        Compares the new data with the last snapshot (reads only, no write lock).
+
+        When data has the same content hash as the last snapshot only its
+        seen_at is touched and ("", "") is returned, so the diff and the
+        fan-out are skipped.
+
+        :param data: The current data.
+        :return: A tuple of (new data, last data, (id, content_hash) of the last snapshot).
+        """
+        if not data:
+            self.logger.error(f"ERROR when getting data from API: data: {data}")
+            return "", "", None
+
+        # Step 0: Same snapshot as last run?
+        content_hash = self.information_manager.content_hash(data)
+        last = self.information_manager.get_last_hash()
+        if last and last[1] == content_hash:
+            self.information_manager.touch(last[0])
+            self.logger.info("Data unchanged since last run (same content hash).")
+            return "", "", last
+
         # Step 1: Fetch the last data from the database
         infos = self.information_manager.get_last_information(1)
         last_data = infos[0][2] if infos else ""
         self.logger.info("Fetched last data from the database.")
+        return data, last_data, last
 
-        if data:
-            # Step 2: Add new data to the database (after getting last_data)
-            self.information_manager.add_information(data)
-            self.logger.info("New data added to the database.")
-            return data, last_data
+    def update_information(self, data: str, last: Optional[tuple]) -> Optional[int]:
+        """
+        Adds the new data to the database, unless another run stored a snapshot
+        after `last` was read (the diff against last data would be stale).
 
-        self.logger.error(f"ERROR when getting data from API: data: {data}")
-        return "", ""
+        :param data: The current data to be saved into the database.
+        :param last: (id, content_hash) returned by compare_information.
+        :return: id of the new snapshot, None when it was not stored.
+        """
+        if self.information_manager.get_last_hash() != last:
+            self.logger.warning("Another run stored a snapshot meanwhile, this one is skipped.")
+            return None
+        snapshot_id = self.information_manager.add_information(data)
+        self.logger.info("New data added to the database.")
+        return snapshot_id
 
     def API(self) -> Optional[str]:
         """
@@ -134,28 +190,56 @@ class Do_Broadcast:
 
         :return: The data fetched from the API.
         """
+        if self.program_index is not None:
+            return self.func(debug=False, include_all=True, index=self.program_index)
         return self.func(debug=False, include_all=True)
 
-    def run(self):
+    def run(self, progress: Optional[Callable[[str], None]] = None):
         """
         Orchestrates the process of fetching data, updating the database, and sending the broadcast.
+
+        :param progress: Called with a short stage description (JobScheduler.report).
         """
+        progress = progress or (lambda stage: None)
         try:
             self.logger.info("Starting broadcast process...")
             # Step 1: Fetch data using the provided function
+            progress("extracting programs")
             api_response = self.API()
 
-            # Step 2: Update information in the database and get the last data
-            data, last_data = self.update_information(data=api_response)
-
-            # Step 3: If data is valid, send the broadcast
+            # Step 2: diff and render against the last snapshot, outside the write lock
+            data, last_data, last = self.compare_information(data=api_response)
+            queued = 0
             if data:
-                self.send_broadcast(data=data, last_data=last_data)
-                self.logger.info(f"✅ Broadcast sent at {datetime.datetime.now()}")
-            else:
+                progress("queueing broadcast")
+                rendered = self.render_groups(self.user_manager.audience_masks(), data, last_data)
+
+                # Step 3: the snapshot and its broadcast marker are committed together,
+                # a crash in between can neither lose the broadcast nor queue it twice
+                with self.db_manager.transaction():
+                    snapshot_id = self.update_information(data, last)
+                    if snapshot_id is None:
+                        data = ""
+                    else:
+                        queued = self.send_broadcast(data=data, last_data=last_data, rendered=rendered,
+                                                     broadcast_id=f"snapshot:{snapshot_id}")
+
+            if not data:
                 self.logger.warning("No new data to send, broadcast skipped.")
+                progress("done, no new data")
+                return
+
+            self.outbox.notify(PRIORITY_BROADCAST)
+            self.logger.info(f"✅ Broadcast queued at {datetime.datetime.now()}: {queued} messages")
+            if self.drain_outbox:
+                progress("sending broadcast")
+                stats = self.outbox.drain(PRIORITY_BROADCAST)
+                progress(f"done, sent {stats['sent']}, failed {stats['failed']}")
+            else:
+                progress(f"done, queued {queued} messages")
         except Exception as e:
             self.logger.error(f"Error during broadcast: {e}")
+            progress(f"failed: {e}")
 
 if __name__ == "__main__":
     # Logger setup for class with class name
@@ -0,0 +1,88 @@
+from typing import Callable, Iterable, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import logging
+
+import requests
+
+from configs.bot_config import BotConfig
+from core.telegram_client import TelegramClient
+
+# on_result(chat_id, chunk_index, result) -> False stops the rest of that chat
+ResultCallback = Callable[[int, int, dict], bool]
+
+class BroadcastEngine:
+    """
+    Concurrent fan-out of pre-split messages.
+
+    Keeps up to MAX_IN_FLIGHT sends running at once. Pacing comes from the
+    client's shared RateLimiter (GLOBAL_RATE overall, PER_CHAT_RATE per chat).
+    Every chunk is tried once: failures go to on_result, which decides about
+    a retry (OutboxWorker schedules it), and a 429 pauses the limiter at once.
+    Chunks of one chat are always sent in order.
+    Total time ~= total_chunks / GLOBAL_RATE instead of users x sleep.
+    """
+    def __init__(self, client: TelegramClient, config: BotConfig):
+        self.logger = logging.getLogger(self.__class__.__name__)  # Logger per class
+
+        self.client = client
+        self.config = config
+
+    def deliver(self, jobs: Iterable[Tuple[int, List[str]]], on_result: Optional[ResultCallback] = None) -> dict:
+        """
+        Blocking entry point, runs the event loop until every job is done.
+
+        :param jobs: (chat_id, chunks) pairs, chunks already split to < 4096 chars.
+        :param on_result: Called after every chunk (runs on the event loop thread).
+        :return: counters {"sent": n, "failed": n}.
+        """
+        return asyncio.run(self._deliver_all(jobs, on_result))
+
+    async def _deliver_all(self, jobs: Iterable[Tuple[int, List[str]]],
+                           on_result: Optional[ResultCallback] = None) -> dict:
+        stats = {"sent": 0, "failed": 0}
+        in_flight = asyncio.Semaphore(self.config.MAX_IN_FLIGHT)
+
+        with ThreadPoolExecutor(max_workers=self.config.MAX_IN_FLIGHT,
+                                thread_name_prefix="broadcast") as executor:
+            tasks = [
+                asyncio.create_task(self._deliver_chat(chat_id, chunks, in_flight, executor, stats, on_result))
+                for chat_id, chunks in jobs
+            ]
+            if tasks:
+                await asyncio.gather(*tasks)
+
+        self.logger.info(f"Broadcast delivered: {stats}")
+        return stats
+
+    async def _deliver_chat(self, chat_id: int, chunks: List[str],
+                            in_flight: asyncio.Semaphore,
+                            executor: ThreadPoolExecutor, stats: dict,
+                            on_result: Optional[ResultCallback] = None):
+        for index, chunk in enumerate(chunks):
+            result = await self._send(chat_id, chunk, in_flight, executor)
+            if result.get("ok"):
+                stats["sent"] += 1
+                self.logger.debug(f"Message part sent successfully to chat_id {chat_id}.")
+            else:
+                stats["failed"] += 1
+                error_description = result.get("description", "No error description provided.")
+                self.logger.error(f"Error sending message part to chat_id {chat_id}: {error_description}")
+            if on_result is not None and on_result(chat_id, index, result) is False:
+                return
+
+    async def _send(self, chat_id: int, chunk: str,
+                    in_flight: asyncio.Semaphore,
+                    executor: ThreadPoolExecutor) -> dict:
+        """one paced attempt, waits without holding a thread"""
+        loop = asyncio.get_running_loop()
+        await self.client.limiter.acquire_chat_async(chat_id)
+        async with in_flight:
+            # global slot only now: a 429 pause also holds back sends that were queued
+            await self.client.limiter.acquire_global_async()
+            try:
+                result = await loop.run_in_executor(executor, self.client.send_once, chat_id, chunk)
+            except requests.RequestException as e:
+                return {"ok": False, "description": str(e)}
+        self.client.flood_wait(result, chat_id)
+        return result
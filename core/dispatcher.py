@@ -0,0 +1,125 @@
+from typing import Callable, Deque, Dict, Hashable, List, Optional
+from collections import deque
+import logging
+import threading
+import time
+
+class UpdateDispatcher:
+    """
+    Worker pool for Telegram updates.
+
+    Updates of one chat are handled one after another, in arrival order;
+    different chats are handled in parallel by up to `workers` threads.
+    Each chat has its own queue and is scheduled on the ready queue only while
+    it has work and no worker holds it, so a slow chat never blocks the others.
+    """
+    def __init__(self,
+                 handler: Callable[[dict], None],
+                 key: Callable[[dict], Hashable],
+                 workers: int = 8,
+                 on_failed: Optional[Callable[[dict, Exception], None]] = None,
+                 attempts: int = 3,
+                 retry_delay: float = 1):
+        """
+        :param handler: Handles one update (runs on a worker thread).
+        :param key: Ordering key of an update (chat_id).
+        :param on_failed: Called with the last error when an update is given up
+                          (e.g. dead-letter the pending row so it is not replayed).
+        :param attempts: Tries per update (transient errors such as "database is locked").
+                         An update still failing is given up, the chat moves on.
+        :param retry_delay: Seconds before the second try, doubled after each failure.
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)  # Logger per class
+        self.handler = handler
+        self.key = key
+        self.on_failed = on_failed
+        self.workers = workers
+        self.attempts = attempts
+        self.retry_delay = retry_delay
+
+        self._cond = threading.Condition()
+        self._chats: Dict[Hashable, Deque[dict]] = {}  # chats with queued or running updates
+        self._ready: Deque[Hashable] = deque()  # chats waiting for a worker
+        self._pending = 0  # submitted, not finished
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+
+    def start(self):
+        with self._cond:
+            if self._threads:
+                return
+            self._stopping = False
+            self._threads = [
+                threading.Thread(target=self._work, name=f"update_worker_{n}", daemon=True)
+                for n in range(self.workers)
+            ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """stop workers once the queued updates are handled"""
+        self.wait_idle(timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, updates: List[dict]):
+        with self._cond:
+            for update in updates:
+                chat = self.key(update)
+                queue = self._chats.get(chat)
+                if queue is None:
+                    queue = self._chats[chat] = deque()
+                    self._ready.append(chat)  # idle chat: schedule it
+                queue.append(update)
+                self._pending += 1
+            self._cond.notify_all()
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """:return: True when every submitted update is handled"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._pending == 0, timeout)
+
+    def _work(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._ready or self._stopping)
+                if not self._ready:
+                    return  # stopping
+                chat = self._ready.popleft()
+                update = self._chats[chat][0]  # chat stays held until this update is done
+
+            self._handle(update)
+
+            with self._cond:
+                queue = self._chats[chat]
+                queue.popleft()
+                if queue:
+                    self._ready.append(chat)  # next update of this chat, behind other chats
+                else:
+                    del self._chats[chat]
+                self._pending -= 1
+                self._cond.notify_all()
+
+    def _handle(self, update: dict):
+        """handler with bounded retries, the chat stays held meanwhile (order is kept)"""
+        for attempt in range(1, self.attempts + 1):
+            try:
+                self.handler(update)
+            except Exception as e:
+                self.logger.error(f"Error while handling update {update.get('update_id')} "
+                                  f"(attempt {attempt}/{self.attempts}): {e}")
+                if attempt < self.attempts:
+                    time.sleep(self.retry_delay * 2 ** (attempt - 1))
+                error = e
+                continue
+            return
+
+        if self.on_failed is not None:
+            try:
+                self.on_failed(update, error)
+            except Exception as e:
+                self.logger.error(f"Error while giving up update {update.get('update_id')}: {e}")
@@ -0,0 +1,151 @@
+from typing import Dict, List, Optional, Tuple
+import logging
+import threading
+import time
+
+from configs.bot_config import BotConfig
+from core.delivery import BroadcastEngine
+from core.telegram_client import TelegramClient
+from models.db import DatabaseManager
+from models.outbox import OutboxManager, PRIORITY_REPLY, PRIORITY_BROADCAST
+
+class OutboxWorker:
+    """
+    Drains the outbox TABLE on background threads, one lane per priority.
+
+    Producers only insert rows (OutboxManager.enqueue / queue_broadcast, inside
+    their own transaction if they like) and call notify(), so they return
+    immediately. Queued broadcasts are expanded into recipient rows batch by
+    batch (OUTBOX_EXPAND_BATCH users per transaction) as the lane drains. Due rows are sent through BroadcastEngine in batches; every chunk is marked
+    sent / failed / retry-later right after Telegram answered, so after a
+    restart the worker resumes with what is still pending and re-sends at most
+    the chunks that were in flight when the process died (once their
+    OUTBOX_LEASE expired). Rows are claimed before they are sent: several
+    workers, also in other processes, can drain the same outbox.
+
+    Command replies have their own lane: they share the RateLimiter with a
+    running broadcast but never wait for its batch to finish.
+    """
+    LANES = (PRIORITY_REPLY, PRIORITY_BROADCAST)
+
+    def __init__(self, db_manager: DatabaseManager, client: TelegramClient, config: BotConfig):
+        self.logger = logging.getLogger(self.__class__.__name__)  # Logger per class
+        self.config = config
+        self.client = client
+        self.outbox_manager = OutboxManager(db_manager=db_manager)
+        self.engine = BroadcastEngine(client=client, config=config)
+
+        self._wake = {priority: threading.Event() for priority in self.LANES}
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._last_purge = float("-inf")
+        self._purge_lock = threading.Lock()  # both lanes call _purge
+
+    def start(self):
+        if any(thread.is_alive() for thread in self._threads):
+            return
+        self._stopping.clear()
+        self._threads = [
+            threading.Thread(target=self._loop, args=(priority,), name=f"outbox-{priority}", daemon=True)
+            for priority in self.LANES
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stopping.set()
+        for wake in self._wake.values():
+            wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def notify(self, priority: Optional[int] = None):
+        """new rows were enqueued (None = wake every lane)"""
+        for lane, wake in self._wake.items():
+            if priority is None or lane == priority:
+                wake.set()
+
+    def enqueue(self, broadcast_id: str, chat_id: int, chunks: List[str],
+                priority: int = PRIORITY_REPLY) -> int:
+        """insert + notify, for producers without a transaction of their own"""
+        added = self.outbox_manager.enqueue(broadcast_id, chat_id, chunks, priority=priority)
+        self.notify(priority)
+        return added
+
+    def drain(self, priority: Optional[int] = None) -> Dict[str, int]:
+        """
+        Send every row that is due now (blocking, used by the worker threads and
+        by standalone runs without them).
+        :param priority: Lane to drain, None = every lane, replies first.
+        :return: counters {"sent": n, "failed": n} of this call.
+        """
+        totals = {"sent": 0, "failed": 0}
+        for lane in (self.LANES if priority is None else (priority,)):
+            while not self._stopping.is_set():
+                # one bounded expansion per batch keeps the recipient rows ahead of the sends
+                expanding = self.outbox_manager.expand(lane, limit=self.config.OUTBOX_EXPAND_BATCH)
+                rows = self.outbox_manager.claim(limit=self.config.OUTBOX_BATCH, priority=lane,
+                                                 lease=self.config.OUTBOX_LEASE)
+                if not rows:
+                    if expanding:
+                        continue
+                    break
+                stats = self._send(rows)
+                totals["sent"] += stats["sent"]
+                totals["failed"] += stats["failed"]
+        self._purge()
+        return totals
+
+    def _loop(self, priority: int):
+        wake = self._wake[priority]
+        while not self._stopping.is_set():
+            try:
+                self.drain(priority)
+                timeout = self.config.OUTBOX_POLL_INTERVAL
+                next_at = self.outbox_manager.next_attempt_at(priority)
+                if next_at is not None:
+                    timeout = min(timeout, max(0.0, next_at - time.time()))
+            except Exception as e:
+                self.logger.error(f"Outbox error: {e}")
+                timeout = self.config.OUTBOX_POLL_INTERVAL
+            wake.wait(timeout)
+            wake.clear()
+
+    def _send(self, rows: List[tuple]) -> dict:
+        # id order per chat is the send order
+        chats: Dict[int, List[Tuple[int, str, int]]] = {}
+        for row_id, chat_id, text, attempts in rows:
+            chats.setdefault(chat_id, []).append((row_id, text, attempts))
+        unsent = {row[0] for row in rows}
+
+        def on_result(chat_id: int, index: int, result: dict) -> bool:
+            row_id, _, attempts = chats[chat_id][index]
+            unsent.discard(row_id)
+            if result.get("ok"):
+                self.outbox_manager.mark_sent(row_id)
+                return True
+
+            # the engine tries once, retries are only scheduled here
+            error = result.get("description", "No error description provided.")
+            delay = self.client.retry_delay(result, attempts + 1)
+            if delay is not None and attempts + 1 < self.config.OUTBOX_MAX_ATTEMPTS:
+                self.outbox_manager.retry_later(row_id, delay, error)
+                return False  # later chunks of this chat wait for this one
+            self.outbox_manager.mark_failed(row_id, error)
+            return True
+
+        jobs = [(chat_id, [text for _, text, _ in chat_rows]) for chat_id, chat_rows in chats.items()]
+        try:
+            return self.engine.deliver(jobs, on_result=on_result)
+        finally:
+            # chunks behind a retry (or a crashed engine run) are not ours any more
+            self.outbox_manager.release(unsent)
+
+    def _purge(self):
+        """forget old sent rows, at most once an hour"""
+        now = time.monotonic()
+        with self._purge_lock:
+            if now - self._last_purge < 3600:
+                return
+            self._last_purge = now
+        self.outbox_manager.purge_sent(older_than=self.config.OUTBOX_RETENTION)
@@ -0,0 +1,118 @@
+from typing import Dict, Hashable
+import asyncio
+import threading
+import time
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+    reserve() takes one token now (the balance may go negative) and returns
+    how long the caller must wait before using it, so waiting can be done
+    with time.sleep or asyncio.sleep outside the lock.
+    """
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    def drain(self, seconds: float):
+        """Push the bucket into debt so nothing passes for `seconds`."""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+    def is_idle(self) -> bool:
+        with self.lock:
+            self._refill(time.monotonic())
+            return self.tokens >= self.capacity
+
+class RateLimiter:
+    """
+    Global bucket + one bucket per chat (Telegram: ~30 msg/s overall, 1 msg/s per chat).
+    Shared by every send path through TelegramClient.limiter: a send takes its
+    chat slot, then its global slot right before the request.
+    """
+    def __init__(self, global_rate: float, per_chat_rate: float,
+                 global_burst: float = 1, per_chat_burst: float = 1,
+                 max_idle_buckets: int = 10000):
+        self.global_bucket = TokenBucket(rate=global_rate, capacity=global_burst)
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.max_idle_buckets = max_idle_buckets
+        self.chats: Dict[Hashable, TokenBucket] = {}
+        self.paused_until = 0.0  # time.monotonic() of the end of the last 429 pause
+        self.lock = threading.Lock()
+
+    def _chat_bucket(self, chat_id: Hashable) -> TokenBucket:
+        with self.lock:
+            bucket = self.chats.get(chat_id)
+            if bucket is None:
+                if len(self.chats) >= self.max_idle_buckets:
+                    self._evict_idle()
+                bucket = TokenBucket(rate=self.per_chat_rate, capacity=self.per_chat_burst)
+                self.chats[chat_id] = bucket
+            return bucket
+
+    def _evict_idle(self):
+        """drop full buckets, they carry no state (caller holds self.lock)"""
+        for chat_id in [k for k, b in self.chats.items() if b.is_idle()]:
+            del self.chats[chat_id]
+
+    def paused_for(self) -> float:
+        """seconds left of the last 429 pause (0 = not paused)"""
+        return max(0.0, self.paused_until - time.monotonic())
+
+    async def acquire_chat_async(self, chat_id: Hashable):
+        """per-chat slot only, it never competes with other chats"""
+        delay = self._chat_bucket(chat_id).reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def acquire_global_async(self):
+        """
+        Global slot, to be taken right before sending (not when a task starts,
+        or a whole batch would book its slots up front and a 429 pause could
+        not hold them back). Re-checked after the wait: if a pause started
+        meanwhile, wait it out and book a new slot.
+        """
+        while True:
+            paused = self.paused_for()
+            if paused > 0:
+                await asyncio.sleep(paused)
+                continue
+            delay = self.global_bucket.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if self.paused_for() <= 0:
+                return
+
+    def pause(self, retry_after: float, chat_id: Hashable = None):
+        """
+        Honor Telegram's parameters.retry_after.
+        A 429 blocks the whole bot: nothing passes the global bucket until
+        paused_until, including sends that already waited for their slot.
+        """
+        if chat_id is not None:
+            self._chat_bucket(chat_id).drain(retry_after)
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+        self.global_bucket.drain(retry_after)
@@ -0,0 +1,131 @@
+from typing import Callable, Optional
+import datetime
+import logging
+import threading
+import time
+
+Progress = Callable[[str], None]
+
+class JobScheduler:
+    """
+    Runs one job (extract + broadcast) on a background thread.
+    - trigger()  : run as soon as possible (/new). Triggers that arrive while a
+                   run is pending or running are merged into that run.
+    - interval   : also run every `interval` seconds after the last run ended (None = off).
+    - status()   : current stage reported by the job through its progress callback.
+    Runs never overlap, so two broadcasts can't race on the same snapshot.
+    """
+    def __init__(self, job: Callable[[Progress], None], interval: Optional[float] = None, name: str = "job"):
+        """
+        :param job: Called as job(progress), progress(stage) updates status().
+        :param interval: Seconds between periodic runs (None or 0 = only on trigger).
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)  # Logger per class
+        self.job = job
+        self.interval = interval or None
+        self.name = name
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._requested = False
+        self._running = False
+        self._next_run: Optional[float] = None  # time.monotonic()
+
+        # progress
+        self.stage = "idle"
+        self.started_at: Optional[datetime.datetime] = None
+        self.finished_at: Optional[datetime.datetime] = None
+        self.runs = 0
+        self.coalesced = 0
+        self.last_error: Optional[str] = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            if self.interval:
+                self._next_run = time.monotonic() + self.interval
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """stop after the current run (if any)"""
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def trigger(self) -> bool:
+        """
+        :return: True if a run was queued, False if merged into a pending / running one.
+        """
+        with self._lock:
+            if self._requested or self._running:
+                self.coalesced += 1
+                return False
+            self._requested = True
+        self._wake.set()
+        return True
+
+    def report(self, stage: str):
+        """progress callback handed to the job"""
+        with self._lock:
+            self.stage = stage
+        self.logger.info(f"[{self.name}] {stage}")
+
+    def status(self) -> str:
+        with self._lock:
+            if self._running:
+                elapsed = (datetime.datetime.now() - self.started_at).total_seconds()
+                state = f"running for {elapsed:.0f}s: {self.stage}"
+            elif self._requested:
+                state = "queued"
+            else:
+                state = "idle"
+            lines = [f"{self.name}: {state}"]
+            if self.finished_at and not self._running:
+                lines.append(f"last run: {self.finished_at:%Y-%m-%d %H:%M:%S}, {self.stage}")
+            if self.last_error:
+                lines.append(f"last error: {self.last_error}")
+            if self._next_run is not None and not self._running:
+                lines.append(f"next run in {max(0.0, self._next_run - time.monotonic()):.0f}s")
+            lines.append(f"runs: {self.runs}, merged triggers: {self.coalesced}")
+        return "\n".join(lines)
+
+    def _loop(self):
+        while not self._stopping.is_set():
+            timeout = None
+            if self._next_run is not None:
+                timeout = max(0.0, self._next_run - time.monotonic())
+            self._wake.wait(timeout)
+            if self._stopping.is_set():
+                break
+
+            with self._lock:
+                self._wake.clear()
+                due = self._next_run is not None and time.monotonic() >= self._next_run
+                if not (self._requested or due):
+                    continue
+                self._requested = False
+                self._running = True
+                self.stage = "starting"
+                self.started_at = datetime.datetime.now()
+                self.last_error = None
+
+            try:
+                self.job(self.report)
+            except Exception as e:
+                self.logger.error(f"[{self.name}] run failed: {e}")
+                with self._lock:
+                    self.last_error = str(e)
+                    self.stage = "failed"
+            finally:
+                with self._lock:
+                    self._running = False
+                    self.runs += 1
+                    self.finished_at = datetime.datetime.now()
+                    if self.interval:
+                        self._next_run = time.monotonic() + self.interval
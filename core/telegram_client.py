@@ -0,0 +1,103 @@
+from typing import Optional
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+
+from configs.bot_config import BotConfig
+from core.rate_limiter import RateLimiter
+
+class TelegramClient:
+    """
+    Pooled keep-alive client for the Telegram Bot API.
+
+    One instance holds a requests.Session, so every getUpdates / sendMessage
+    reuses the same TCP+TLS connections instead of opening a new one per call.
+    Payloads go as POST JSON bodies and every call has a (connect, read) timeout.
+    Sends are paced by one shared RateLimiter; failed sends are retried by the outbox.
+    """
+    def __init__(self, config: BotConfig, limiter: Optional[RateLimiter] = None):
+        self.logger = logging.getLogger(self.__class__.__name__)  # Logger per class
+
+        self.config = config
+        self.base_url = config.BASE_URL
+        self.session = self._build_session()
+        self.limiter = limiter or RateLimiter(global_rate=config.GLOBAL_RATE,
+                                              per_chat_rate=config.PER_CHAT_RATE,
+                                              global_burst=config.GLOBAL_BURST)
+
+    def _build_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1,
+                              pool_maxsize=self.config.POOL_SIZE,
+                              max_retries=0)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def call(self, method: str, payload: Optional[dict] = None, read_timeout: Optional[float] = None) -> dict:
+        """
+        POST one Bot API method and return the decoded JSON result.
+
+        :param method: Bot API method name (e.g. 'sendMessage').
+        :param payload: JSON body of the request.
+        :param read_timeout: Read timeout override (long polling needs more than the default).
+        :raises requests.RequestException: On network errors.
+        """
+        url = f"{self.base_url}/{method}"
+        timeout = (self.config.CONNECT_TIMEOUT, read_timeout or self.config.READ_TIMEOUT)
+        response = self.session.post(url, json=payload or {}, timeout=timeout)
+        return response.json()
+
+    def get_updates(self, offset: Optional[int] = None) -> dict:
+        """long polling, read timeout = polling timeout + small margin"""
+        payload = {'offset': offset, 'timeout': self.config.TIMEOUT}
+        return self.call("getUpdates", payload, read_timeout=self.config.TIMEOUT + self.config.READ_TIMEOUT)
+
+    def set_webhook(self, url: str, secret_token: str) -> dict:
+        """Telegram POSTs every update to url with the secret token header"""
+        return self.call("setWebhook", {'url': url, 'secret_token': secret_token})
+
+    def delete_webhook(self) -> dict:
+        """back to getUpdates (pending updates are kept)"""
+        return self.call("deleteWebhook", {'drop_pending_updates': False})
+
+    def send_once(self, chat_id: int, text: str) -> dict:
+        """send one chunk (len(text) < 4096), no pacing and no retry"""
+        return self.call("sendMessage", {'chat_id': chat_id, 'text': text})
+
+    def flood_wait(self, result: dict, chat_id: Optional[int] = None) -> Optional[float]:
+        """
+        retry_after of a 429 answer, the shared limiter is paused for it at once
+        (None for any other answer)
+        """
+        if result.get("ok") or result.get("error_code") != 429:
+            return None
+        retry_after = (result.get("parameters") or {}).get("retry_after", self.config.RETRY_BASE_DELAY)
+        self.logger.warning(f"Flood limit hit, retry after {retry_after}s (chat_id {chat_id})")
+        self.limiter.pause(retry_after)
+        return retry_after
+
+    def retry_delay(self, result: dict, attempt: int) -> Optional[float]:
+        """
+        Decide whether a failed sendMessage is worth another attempt.
+        Network errors carry no error_code, they are retried like 5xx.
+
+        :param attempt: Attempts made so far (1 = first failure).
+        :return: seconds to wait before the next attempt, or None when result is final.
+        """
+        if result.get("ok"):
+            return None
+
+        error_code = result.get("error_code", 0)
+        if error_code == 429:
+            return (result.get("parameters") or {}).get("retry_after", self.backoff(attempt))
+        if error_code == 0 or error_code >= 500:
+            return self.backoff(attempt)
+        return None
+
+    def backoff(self, attempt: int) -> float:
+        """exponential backoff, capped at RETRY_MAX_DELAY"""
+        return min(self.config.RETRY_BASE_DELAY * 2 ** (attempt - 1), self.config.RETRY_MAX_DELAY)
+
+    def close(self):
+        self.session.close()
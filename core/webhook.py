@@ -0,0 +1,142 @@
+from typing import Callable, Optional, Set
+import asyncio
+import hmac
+import json
+import logging
+import ssl
+
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+
+class WebhookServer:
+    """
+    Minimal asyncio HTTP/1.1 server receiving Telegram webhook updates.
+    Telegram only delivers to HTTPS: pass an ssl_context, or run it behind a
+    TLS reverse proxy.
+
+    Only `POST <path>` with the right X-Telegram-Bot-Api-Secret-Token header is
+    accepted. The update is handed to `on_update` (in a thread, it may write to
+    the DB) and 200 is answered only after it returned, so Telegram re-delivers
+    anything that was not handed off. Keep-alive connections are served, so
+    Telegram can reuse one connection for many updates.
+    """
+    REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+               405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+    def __init__(self,
+                 on_update: Callable[[dict], None],
+                 secret_token: str,
+                 host: str = "0.0.0.0",
+                 port: int = 8443,
+                 path: str = "/telegram",
+                 max_body: int = 1024 * 1024,
+                 ssl_context: Optional[ssl.SSLContext] = None):
+        """
+        :param on_update: Durable hand-off of one update (BotRunner.hand_off).
+        :param port: 0 picks a free port (see self.port once started).
+        :param ssl_context: Serve HTTPS with it, None = plain HTTP.
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)  # Logger per class
+        self.on_update = on_update
+        self.secret_token = secret_token.encode("utf-8")
+        self.host = host
+        self.port = port
+        self.path = path
+        self.max_body = max_body
+        self.ssl_context = ssl_context
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopped: Optional[asyncio.Event] = None
+        self._connections: Set[asyncio.Task] = set()
+
+    def serve_forever(self):
+        """blocking, until stop() is called from another thread"""
+        asyncio.run(self._serve())
+
+    def stop(self):
+        if self._loop is not None and self._stopped is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, ssl=self.ssl_context)
+        self.port = self._server.sockets[0].getsockname()[1]
+        scheme = "https" if self.ssl_context else "http"
+        self.logger.info(f"Webhook listening on {scheme}://{self.host}:{self.port}{self.path}")
+
+    async def _serve(self):
+        await self.start()
+        async with self._server:
+            await self._stopped.wait()
+            # idle keep-alive connections would otherwise be cancelled mid-read
+            for task in list(self._connections):
+                task.cancel()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break  # client closed the connection
+                method, target, version = (request_line.decode("latin-1").split(" ", 2) + ["", ""])[:3]
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length") or 0)
+                if length > self.max_body:
+                    await self._respond(writer, 413, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                status = await self._dispatch(method, target, headers, body)
+                keep_alive = (headers.get("connection", "").lower() != "close"
+                              and version.strip() == "HTTP/1.1")
+                await self._respond(writer, status, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError) as e:
+            self.logger.debug(f"Webhook connection dropped: {e}")
+        except asyncio.CancelledError:
+            pass  # server stopping
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _dispatch(self, method: str, target: str, headers: dict, body: bytes) -> int:
+        if target.split("?", 1)[0] != self.path:
+            return 404
+        if method != "POST":
+            return 405
+        if not hmac.compare_digest(headers.get(SECRET_HEADER, "").encode("utf-8"), self.secret_token):
+            self.logger.warning("Webhook request with a wrong secret token")
+            return 403
+        try:
+            update = json.loads(body)
+        except ValueError:
+            return 400
+        if not isinstance(update, dict) or "update_id" not in update:
+            return 400
+
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.on_update, update)
+        except Exception as e:
+            self.logger.error(f"Error while handing off update {update.get('update_id')}: {e}")
+            return 500  # Telegram will deliver it again
+        return 200
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, keep_alive: bool):
+        writer.write(
+            f"HTTP/1.1 {status} {self.REASONS.get(status, '')}\r\n"
+            f"Content-Length: 0\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1")
+        )
+        await writer.drain()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: normalize_item / extract_nested (dict per item)
+against the compiled projector (tuple per item).
+
+usage: python -m experiments.bench_projection [items] [extra_fields]
+"""
+import sys
+import timeit
+
+from configs.browser_config import BrowserConfig
+from plugin.extract_data.process import normalize_item
+from plugin.extract_data.projection import compile_projector
+
+def build_fields(extra: int) -> dict:
+    fields = dict(BrowserConfig().fields)
+    for i in range(extra):
+        fields[f"extra_{i}"] = {"path": ["meta", f"k{i}", "value"], "default": None}
+    return fields
+
+def build_items(count: int, extra: int) -> list:
+    return [
+        {
+            "title": f"program {n}",
+            "last_update_at": "2024-01-01T00:00:00+00:00",
+            "meta": {f"k{i}": {"value": i} for i in range(0, extra, 2)},  # half of the paths miss
+        }
+        for n in range(count)
+    ]
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    extra = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    fields = build_fields(extra)
+    items = build_items(count, extra)
+    project = compile_projector(fields)
+
+    # same values, same order
+    assert all(tuple(normalize_item(item, fields).values()) == project(item) for item in items)
+
+    runs = 20
+    dict_time = min(timeit.repeat(lambda: [normalize_item(item, fields) for item in items], number=1, repeat=runs))
+    tuple_time = min(timeit.repeat(lambda: [project(item) for item in items], number=1, repeat=runs))
+
+    print(f"{count} items x {len(fields)} fields (best of {runs})")
+    print(f"normalize_item : {dict_time * 1000:8.2f} ms")
+    print(f"projector      : {tuple_time * 1000:8.2f} ms  ({dict_time / tuple_time:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Browser fallback against a local stand-in of the programs site.
+
+The server has an API (/programs?page=N, 3 pages) and a web page
+(/app?page=N) that loads it with fetch() next to an image, a font and a
+stylesheet. The API backend is registered as "down", so DataExtractor falls
+back to the browser twice; the report shows the cold start, the warm run,
+and that no blocked resource reached the server.
+
+usage: python -m experiments.browser_smoke
+needs: playwright install chromium
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from collections import Counter
+from urllib.parse import urlparse, parse_qs
+import json
+import threading
+import time
+
+from configs.browser_config import BrowserConfig
+from plugin.extract_data.backends import register_backend
+from plugin.extract_data.get_data_browser import get_session
+from plugin.extract_data.process import DataExtractor
+
+NB_PAGES = 3
+PER_PAGE = 5
+HITS: Counter = Counter()
+
+APP_HTML = """<!doctype html>
+<html><head>
+<link rel="stylesheet" href="/static/app.css">
+<style>@font-face { font-family: f; src: url(/static/font.woff2); } body { font-family: f; }</style>
+</head><body>
+<img src="/static/logo.png">
+<script>fetch("/programs?page=" + new URLSearchParams(location.search).get("page"));</script>
+</body></html>"""
+
+def api_down(config, page=1, cache=None):
+    return {"error": "API fetch failed", "page": page}
+
+class StandIn(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        HITS[url.path] += 1
+        page = int(parse_qs(url.query).get("page", ["1"])[0])
+        if url.path == "/programs":
+            items = [{"title": f"program {page}-{n}", "last_update_at": "2024-01-01",
+                      "public": True, "status": "V", "bounty": True}
+                     for n in range(PER_PAGE)]
+            body = json.dumps({"items": items, "pagination": {"nb_pages": NB_PAGES}})
+            self._send(body, "application/json")
+        elif url.path == "/app":
+            self._send(APP_HTML, "text/html")
+        else:
+            self._send("", "application/octet-stream")
+
+    def _send(self, body: str, content_type: str):
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    root = f"http://127.0.0.1:{server.server_port}"
+
+    config = BrowserConfig()
+    config.base_url = f"{root}/programs?page=1&resultsPerPage={PER_PAGE}"
+    config.browser_entry_url = root + "/app?page={page}"
+    config.use_http_cache = False
+    config.requests_per_second = 100
+    config.max_retries = 1
+    register_backend("api", "experiments.browser_smoke:api_down")
+
+    try:
+        for label in ("cold", "warm"):
+            start = time.perf_counter()
+            rows = DataExtractor(config=config, include_all=True).extract() or []
+            print(f"{label}: {len(rows)} rows in {(time.perf_counter() - start) * 1000:.0f} ms")
+    finally:
+        get_session(config).close()
+        server.shutdown()
+
+    blocked = sum(count for path, count in HITS.items() if path.startswith("/static/"))
+    print(f"server hits: {dict(HITS)}")
+    print(f"blocked resources that reached the server: {blocked}")
+
+if __name__ == "__main__":
+    main()
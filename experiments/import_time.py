@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Startup cost of the bot: imports `main` in a fresh interpreter with
+`python -X importtime` and prints the slowest modules (cumulative time)
+plus the heavy optional packages that got loaded at startup.
+
+usage: python -m experiments.import_time [module] [top]
+"""
+import os
+import subprocess
+import sys
+import time
+
+# should only be imported when an extraction needs them
+HEAVY = ("playwright", "requests", "tabulate")
+
+def import_report(module: str) -> list:
+    """[(cumulative_us, self_us, name)] for every module imported by `module`"""
+    root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=root, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    return rows
+
+def main():
+    module = sys.argv[1] if len(sys.argv) > 1 else "main"
+    top = int(sys.argv[2]) if len(sys.argv) > 2 else 15
+
+    start = time.perf_counter()
+    rows = import_report(module)
+    wall = time.perf_counter() - start
+
+    print(f"import {module}: {len(rows)} modules, interpreter + imports {wall * 1000:.0f} ms")
+    print(f"{'cumulative ms':>14} {'self ms':>8}  module")
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>8.1f}  {name}")
+
+    loaded = {name.strip().split(".")[0] for _, _, name in rows}
+    print("\nheavy packages at startup: " + (", ".join(p for p in HEAVY if p in loaded) or "none"))
+
+if __name__ == "__main__":
+    main()
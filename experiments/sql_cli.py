@@ -1,5 +1,4 @@
 from tabulate import tabulate
-import sqlite3
 import re
 import shutil
 import textwrap
@@ -7,10 +6,12 @@ import datetime
 
 # Database path
 from configs.bot_config import BotConfig
+from models.db import DatabaseManager
 config = BotConfig()
 DB_PATH = config.DB_FILE
 
-conn = sqlite3.connect(DB_PATH)
+# same WAL connection setup as the bot, reads here never block its writes
+conn = DatabaseManager(DB_PATH).connection()
 cursor = conn.cursor()
 
 # show guide
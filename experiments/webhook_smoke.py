@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for Telegram's webhook delivery.
+
+Starts core.webhook.WebhookServer on a free port and POSTs updates to it the
+way Telegram does (JSON body, secret token header, keep-alive connection),
+then prints the hand-off latency and checks that bad requests are refused.
+
+usage: python -m experiments.webhook_smoke [updates]
+"""
+import statistics
+import sys
+import threading
+import time
+
+import requests
+
+from core.webhook import WebhookServer
+
+SECRET = "stand-in-secret"
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    received = []
+    server = WebhookServer(on_update=received.append, secret_token=SECRET,
+                           host="127.0.0.1", port=0, path="/telegram")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    while server._server is None:
+        time.sleep(0.01)
+    url = f"http://127.0.0.1:{server.port}/telegram"
+
+    session = requests.Session()
+    headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+    latencies = []
+    for update_id in range(count):
+        update = {"update_id": update_id, "message": {"chat": {"id": update_id % 10}, "text": "/help"}}
+        start = time.perf_counter()
+        response = session.post(url, json=update, headers=headers, timeout=5)
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.status_code
+
+    latencies.sort()
+    print(f"{len(received)}/{count} updates handed off, "
+          f"p50 {statistics.median(latencies):.2f} ms, p95 {latencies[int(len(latencies) * 0.95) - 1]:.2f} ms")
+
+    checks = {
+        "wrong secret": session.post(url, json={"update_id": -1}, headers={"X-Telegram-Bot-Api-Secret-Token": "x"}).status_code,
+        "no secret": session.post(url, json={"update_id": -1}).status_code,
+        "wrong path": session.post(url + "x", json={"update_id": -1}, headers=headers).status_code,
+        "GET": session.get(url, headers=headers).status_code,
+        "bad json": session.post(url, data=b"{", headers=headers).status_code,
+    }
+    print(checks, "refused updates handed off:", sum(1 for u in received if u["update_id"] < 0))
+    server.stop()
+
+if __name__ == "__main__":
+    main()
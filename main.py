@@ -1,13 +1,21 @@
-from typing import Optional
+from typing import List, Optional
+import sqlite3
+import ssl
 import time
-import requests
+import uuid
 import logging
 
 from core.bot import TelegramBot
+from core.dispatcher import UpdateDispatcher
+from core.outbox import OutboxWorker
+from core.webhook import WebhookServer
+from core.telegram_client import TelegramClient
 from models.db import DatabaseManager
 from models.settings import SettingsManager
 from models.informations import InformationDateManager
 from models.users import UserManager, User
+from models.updates import PendingUpdateManager
+from models.outbox import PRIORITY_REPLY
 from configs.bot_config import BotConfig
 from views.network_utils import split_message
 
@@ -22,104 +30,215 @@ class BotRunner:
         self.db_manager = DatabaseManager(self.config.DB_FILE)
         self.user_manager = UserManager(db_manager=self.db_manager)
         self.settings_manager = SettingsManager(db_manager=self.db_manager)
-        self.information_manager = InformationDateManager(db_manager=self.db_manager)
+        self.information_manager = InformationDateManager(db_manager=self.db_manager,
+                                                          storage=self.config.SNAPSHOT_STORAGE,
+                                                          keyframe_interval=self.config.KEYFRAME_INTERVAL)
+        self.pending_manager = PendingUpdateManager(db_manager=self.db_manager)
+        self.client = TelegramClient(config=self.config)
+        # every reply / broadcast goes through the outbox TABLE
+        self.outbox = OutboxWorker(db_manager=self.db_manager, client=self.client, config=self.config)
         self.bot = TelegramBot(
             config=self.config,
-            user_manager=self.user_manager
+            user_manager=self.user_manager,
+            client=self.client,
+            outbox=self.outbox
+        )
+        # updates: in order per chat, chats in parallel
+        self.dispatcher = UpdateDispatcher(
+            handler=self.process_update,
+            key=self.update_key,
+            on_failed=self.give_up,
+            workers=self.config.UPDATE_WORKERS
         )
 
         # Status
         self.offset: Optional[int] = self.settings_manager.get_offset()
+        self.error_count: int = 0 # consecutive getUpdates failures
+        self.last_purge: float = float("-inf") # time.monotonic() of the last purge_handled
 
     def get_updates(self, offset=None) -> dict:
         """
         big O = (self.config.TIMEOUT)
         """
 
-        # send requests
-        url = f"{self.config.BASE_URL}/getUpdates"
-        params = {'offset': offset, 'timeout': self.config.TIMEOUT}
-
         try:
-            response = requests.get(url, params=params)
+            updates = self.client.get_updates(offset=offset)
         except Exception as e:
             self.logger.error(f"Error while getting updates: {e}")
             self.ERR_HANDELER() # Network Error
             return {}
 
-        return response.json()
+        if not updates.get('ok', False):
+            # e.g. 409 while a webhook is still registered: back off instead of spinning
+            self.logger.error(f"getUpdates refused: {updates.get('error_code')} {updates.get('description')}")
+            self.ERR_HANDELER()
+            return {}
+
+        self.error_count = 0
+        return updates
 
-    def send_message(self, chat_id: int, text: str):
+    def send_message(self, chat_id: int, text: str, broadcast_id: Optional[str] = None):
         """
-        big O = (self.config.LIMIT)
+        queue a reply in the outbox, sent by the outbox worker
+        (paced by client.limiter, 429/5xx/network errors retried with backoff)
+
+        :param broadcast_id: Idempotency key, e.g. the update being answered.
         """
         # split if len(text) >= 4096
         messages: list[str] = split_message(text)
+        self.outbox.enqueue(broadcast_id or f"message:{uuid.uuid4().hex}", chat_id, messages,
+                            priority=PRIORITY_REPLY)
 
-        for chunk in messages:
-            url = f"{self.config.BASE_URL}/sendMessage"
-            params = {'chat_id': chat_id, 'text': chunk}
-            response = requests.get(url, params=params)
-
-            result: dict = response.json()
-            if result.get("ok"):
-                self.logger.info(f"Message part sent successfully to chat_id {chat_id}.")
-            else:
-                error_description = result.get("description", "No error description provided.")
-                self.logger.error(f"Error sending message part to chat_id {chat_id}: {error_description}")
-
-            time.sleep(self.config.LIMIT)
-
-    def process_commands(self, updates):
-        for update in updates['result']:
-            chat_id = update['message']['chat']['id']
-            text = update['message']['text']
-
-            # add_user(user) if not user in DB
-            user = self.user_manager.get_user(chat_id)
-            if not user:
-                user = User(chat_id)
-                self.user_manager.add_user(user)
-                self.send_message(chat_id, f"{self.config.WHEN_no_auth_replay}\n{text}")
-                self.logger.info(f"New user added with chat_id {chat_id}")
-                return
-
-            self.logger.debug(f"user text is:\n{text}")
-
-            result = self.bot.dispatch(id=user.id, chat_id=user.chat_id, timestamp=user.timestamp, flags=user.flags, text=text)
-            if result:
-                self.logger.info(f"Processing result for chat_id {chat_id}")
-                self.logger.debug(f"{result}")
-                self.send_message(chat_id, f"{result}")
+    @staticmethod
+    def update_key(update: dict):
+        """ordering key: the chat (updates without one are independent)"""
+        chat = (update.get('message') or {}).get('chat') or {}
+        return chat.get('id', ('update', update.get('update_id')))
+
+    def process_update(self, update: dict):
+        """
+        handle one pending update exactly once, runs on a dispatcher worker:
+        its writes (new user, flags, outbox reply) and the handled mark of
+        its pending row commit together, so a replay after a crash is either
+        the first run or a no-op (the /removed, /added, /common toggles are
+        never applied twice). On error everything rolls back and the
+        dispatcher retries, after its last attempt give_up dead-letters it.
+        """
+        try:
+            with self.db_manager.transaction():
+                if not self.pending_manager.done(update['update_id']):
+                    return  # already handled
+                self.handle_update(update)
+        except Exception:
+            self.user_manager.invalidate()  # the cache may hold rolled back writes
+            raise
+        self.outbox.notify(PRIORITY_REPLY)  # the reply is visible to the outbox only now
+
+    def give_up(self, update: dict, error: Exception):
+        """the dispatcher's last attempt failed: never replay this update"""
+        self.logger.error(f"Giving up update {update['update_id']}: {error}")
+        self.pending_manager.give_up(update['update_id'], str(error))
+
+    def handle_update(self, update: dict):
+        """
+        handle one update, runs on a dispatcher worker (in order within its chat)
+        """
+        message = update.get('message') or {}
+        chat_id = message.get('chat', {}).get('id')
+        text = message.get('text')
+        if chat_id is None or text is None:
+            self.logger.debug(f"Skipping update {update.get('update_id')}: no text message")
+            return
+
+        reply_id = f"update:{update['update_id']}"  # a replayed update is not answered twice
+
+        # add_user(user) if not user in DB
+        user = self.user_manager.get_user(chat_id)
+        if not user:
+            # OR IGNORE: the update may be replayed after a crash
+            self.user_manager.add_users([User(chat_id=chat_id)])
+            self.send_message(chat_id, f"{self.config.WHEN_no_auth_replay}\n{text}", broadcast_id=reply_id)
+            self.logger.info(f"New user added with chat_id {chat_id}")
+            return
+
+        self.logger.debug(f"user text is:\n{text}")
+
+        result = self.bot.dispatch(id=user.id, chat_id=user.chat_id, timestamp=user.timestamp, flags=user.flags, text=text)
+        if result:
+            self.logger.info(f"Processing result for chat_id {chat_id}")
+            self.logger.debug(f"{result}")
+            self.send_message(chat_id, f"{result}", broadcast_id=reply_id)
 
     def message_processor(self, offset: Optional[int]=None) -> Optional[int]:
         updates = self.get_updates(offset=offset)
+        batch: List[dict] = updates.get('result', [])
 
-        if updates.get('result', []):
-            self.process_commands(updates)
-
-            last_update = updates.get('result', [])[-1]
+        if batch:
+            last_update = batch[-1]
             new_offset = last_update.get('update_id', None)
 
             if new_offset is not None:
                 new_offset += 1
-                self.settings_manager.set_offset(new_offset)  # update new offset
+            self.hand_off(batch, new_offset)
+
+            if new_offset is not None:
                 self.logger.info(f"Offset updated to {new_offset}")
                 return new_offset
 
         return offset
 
+    def hand_off(self, batch: List[dict], new_offset: Optional[int] = None):
+        """
+        durable hand-off: one commit for the batch (+ offset), then the workers take over
+        (getUpdates batches and webhook updates alike)
+        """
+        with self.db_manager.transaction():
+            self.pending_manager.add_many(batch)
+            if new_offset is not None:
+                self.settings_manager.set_offset(new_offset)  # update new offset
+        self.dispatcher.submit(batch)
+
+        if time.monotonic() - self.last_purge >= 3600:
+            self.last_purge = time.monotonic()
+            self.pending_manager.purge_handled(older_than=self.config.HANDLED_RETENTION)
+
     def process_messages(self):
-        self.offset = self.message_processor(self.offset)
+        try:
+            self.offset = self.message_processor(self.offset)
+        except sqlite3.OperationalError as e:
+            # e.g. "database is locked": the offset did not move, the batch is fetched again
+            self.logger.error(f"Database error while handing off updates: {e}")
+            self.ERR_HANDELER()
 
     def ERR_HANDELER(self):
-        time.sleep(self.config.LIMIT)
+        """exponential backoff while the network keeps failing"""
+        self.error_count += 1
+        time.sleep(self.client.backoff(self.error_count))
+
+    def run_webhook(self):
+        """receive updates from Telegram instead of polling (UPDATE_MODE = "webhook")"""
+        if self.config.WEBHOOK_URL:
+            result = self.client.set_webhook(self.config.WEBHOOK_URL, self.config.WEBHOOK_SECRET)
+            self.logger.info(f"setWebhook: {result}")
+        ssl_context = None
+        if self.config.WEBHOOK_CERT:
+            ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            ssl_context.load_cert_chain(self.config.WEBHOOK_CERT, self.config.WEBHOOK_KEY or None)
+        server = WebhookServer(
+            on_update=lambda update: self.hand_off([update]),
+            secret_token=self.config.WEBHOOK_SECRET,
+            host=self.config.WEBHOOK_HOST,
+            port=self.config.WEBHOOK_PORT,
+            path=self.config.WEBHOOK_PATH,
+            ssl_context=ssl_context
+        )
+        server.serve_forever()
+
+    def run_polling(self):
+        """getUpdates loop (UPDATE_MODE = "polling")"""
+        try:
+            # getUpdates answers 409 while a webhook is registered (left over from webhook mode)
+            result = self.client.delete_webhook()
+            self.logger.info(f"deleteWebhook: {result}")
+        except Exception as e:
+            self.logger.error(f"Error while deleting the webhook: {e}")
 
-    def run(self):
         # Main Loop
         while True:
             self.process_messages()
 
+    def run(self):
+        self.outbox.start() # resumes what was queued before a restart
+        self.bot.scheduler.start() # /new and periodic broadcasts, in the background
+        self.dispatcher.start()
+        # updates acknowledged before a restart but never handled
+        self.dispatcher.submit(self.pending_manager.load())
+
+        if self.config.UPDATE_MODE == "webhook":
+            self.run_webhook()
+        else:
+            self.run_polling()
+
 if __name__ == "__main__":
     # Logger setup for class with class name
     # logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
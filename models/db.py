@@ -1,73 +1,184 @@
 import sqlite3
-from typing import Tuple
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable, Iterator, Tuple
+
+from models.migrations import migrate
 
 class DatabaseManager:
-    """manage SQLite DB"""
-    def __init__(self, db_file: str):
+    """
+    manage SQLite DB
+
+    Keeps one long-lived connection per thread (sqlite3 connections must not be
+    shared across threads) in WAL mode, so readers (broadcaster, sql_cli) never
+    block the polling loop's writes. Each connection keeps a prepared statement
+    cache, so the same query text is compiled only once.
+    """
+    PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",   # safe with WAL, fsync only at checkpoints
+        "PRAGMA cache_size=-16000",    # ~16 MB page cache
+        "PRAGMA mmap_size=268435456",  # 256 MB memory mapped reads
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA busy_timeout=5000",
+    )
+
+    def __init__(self, db_file: str, cached_statements: int = 256):
         self.db_file = db_file
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._connections: list = []
+        self._lock = threading.Lock()
         self._create_tables()
 
-    def _connect(self):
-        """Connect to DB"""
-        return sqlite3.connect(self.db_file)
+    def _connect(self) -> sqlite3.Connection:
+        """Connection of the current thread (opened once, then reused)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # check_same_thread=False only so close() can run from any thread
+            conn = sqlite3.connect(self.db_file,
+                                   cached_statements=self.cached_statements,
+                                   check_same_thread=False)
+            for pragma in self.PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """raw connection of the current thread (for tools like sql_cli)"""
+        return self._connect()
+
+    def close(self):
+        """Close every connection opened by this manager"""
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
 
     def _create_tables(self):
-        """Create TABLES"""
+        """Create / upgrade TABLES (see models/migrations.py)"""
+        migrate(self._connect())
+
+    def in_transaction(self) -> bool:
+        """the current thread is inside transaction()"""
+        return getattr(self._local, "depth", 0) > 0
+
+    def after_commit(self, callback: Callable[[], None]):
+        """
+        Run callback once the outermost transaction() of this thread committed
+        (at once outside of one); it is dropped when the transaction rolls back.
+        """
+        if self.in_transaction():
+            self._local.after_commit.append(callback)
+        else:
+            callback()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Group statements into one commit (one fsync).
+        Nested blocks join the outer transaction; an exception rolls everything back.
+
+            with db_manager.transaction():
+                user_manager.add_users(users)
+                settings_manager.set_offset(offset)
+        """
         conn = self._connect()
-        cursor = conn.cursor()
-
-        # Users TABLE
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT,
-                chat_id INTEGER UNIQUE,
-                flags TEXT DEFAULT "0000"
-            )
-        ''')
-
-        # Settings TABLE
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS settings (
-                key TEXT PRIMARY KEY,
-                value TEXT
-            )
-        ''')
-
-        # informations TABLE
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS informations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT,
-                data TEXT
-            )
-        ''')
+        depth = getattr(self._local, "depth", 0)
+        if depth == 0:
+            conn.execute("BEGIN IMMEDIATE")
+            self._local.after_commit = []
+        self._local.depth = depth + 1
+        try:
+            yield conn
+        except BaseException:
+            if depth == 0:
+                conn.rollback()
+            raise
+        else:
+            if depth == 0:
+                conn.commit()
+        finally:
+            self._local.depth = depth
+        if depth == 0:
+            callbacks, self._local.after_commit = self._local.after_commit, []
+            for callback in callbacks:
+                callback()
 
-        conn.commit()
-        conn.close()
+    def execute(self, query: str, params: Tuple = ()) -> sqlite3.Cursor:
+        """Run once query in DB (commits unless inside transaction())"""
+        with self._autocommit() as conn:
+            return conn.execute(query, params)
+
+    def executemany(self, query: str, seq_of_params: Iterable[Tuple]):
+        """Run one query for every params tuple, single commit"""
+        with self._autocommit() as conn:
+            conn.executemany(query, seq_of_params)
 
-    def execute(self, query: str, params: Tuple = ()):
-        """Run once query in DB"""
+    @contextmanager
+    def _autocommit(self) -> Iterator[sqlite3.Connection]:
+        """
+        commit after the statement, or roll back when it failed: the connection
+        lives on, a failed write ("database is locked") must not leave its
+        implicit transaction open (later reads would keep seeing its snapshot)
+        """
         conn = self._connect()
-        cursor = conn.cursor()
-        cursor.execute(query, params)
+        if self.in_transaction():
+            yield conn  # transaction() commits or rolls back
+            return
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
         conn.commit()
-        conn.close()
 
     def fetch_all(self, query: str, params: Tuple = ()):
         """get all data as once query"""
-        conn = self._connect()
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        results = cursor.fetchall()
-        conn.close()
-        return results
+        return self._connect().execute(query, params).fetchall()
 
     def fetch_one(self, query: str, params: Tuple = ()):
         """get once line"""
-        conn = self._connect()
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        result = cursor.fetchone()
-        conn.close()
-        return result
+        return self._connect().execute(query, params).fetchone()
+
+    def iter_rows(self, query: str, params: Tuple = (), batch_size: int = 500) -> Iterator[tuple]:
+        """
+        Stream rows in fetchmany batches, at most batch_size rows in memory.
+        The read cursor stays open until the iterator is exhausted or closed.
+        """
+        cursor = self._connect().execute(query, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            cursor.close()
+
+    def iter_keyset(self,
+                    query: str,
+                    params: Tuple = (),
+                    after: Any = 0,
+                    key_index: int = 0,
+                    batch_size: int = 500) -> Iterator[tuple]:
+        """
+        Stream rows by keyset pagination: one short query per page, no cursor
+        is held between pages, so writers are never blocked and rows added
+        meanwhile are picked up if their key is larger.
+
+        The query takes the last key and the page size as its last two params:
+            SELECT id, chat_id FROM users WHERE id > ? ORDER BY id LIMIT ?
+
+        :param after: Start below every key (0 for AUTOINCREMENT ids).
+        :param key_index: Column of the key in the selected row.
+        """
+        while True:
+            rows = self.fetch_all(query, (*params, after, batch_size))
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            after = rows[-1][key_index]
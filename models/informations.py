@@ -1,51 +1,184 @@
-from typing import Optional
-from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Tuple
+from datetime import datetime, timedelta
+import hashlib
 
 from models.db import DatabaseManager
+from models.snapshot_delta import (make_delta, apply_delta,
+                                   compress_text, decompress_text,
+                                   compress_delta, decompress_delta)
+
+# informations.kind
+KIND_FULL = "full"          # plain text in `data` (storage="full" and legacy rows)
+KIND_KEYFRAME = "keyframe"  # zlib text in `payload`
+KIND_DELTA = "delta"        # zlib line delta against row `base_id` in `payload`
 
 class InformationDateManager:
-    """manage information TABLE"""
-    
-    def __init__(self, db_manager: DatabaseManager):
+    """
+    manage information TABLE
+
+    storage="full"  : every snapshot is stored as plain text (old behaviour).
+    storage="delta" : a compressed keyframe every `keyframe_interval` snapshots,
+                      compressed line deltas against the previous snapshot between them.
+    Reads always return plain text rows (id, timestamp, data).
+    """
+    COLUMNS = "id, timestamp, kind, base_id, depth, data, payload"
+
+    def __init__(self, db_manager: DatabaseManager, storage: str = "full", keyframe_interval: int = 50):
         self.db_manager = db_manager
+        self.storage = storage
+        self.keyframe_interval = keyframe_interval
+
+        # (id, depth, text) of the newest snapshot seen by any read or add, saves a
+        # reconstruct per add / latest read (keep one manager across broadcast runs)
+        self._latest: Optional[Tuple[int, int, str]] = None
 
     def get_last_information(self, last: int = 1) -> list:
         """get last data with counter variable last"""
-        query = "SELECT id, timestamp, data FROM informations ORDER BY timestamp DESC LIMIT ?"
-        return self.db_manager.fetch_all(query, (last,))
-
-    def get_all_in_date(self, 
-                        year: Optional[int] = None, 
-                        month: Optional[int] = None, 
-                        day: Optional[int] = None) -> list:
-        """get data with time parameter"""
+        query = f"SELECT {self.COLUMNS} FROM informations ORDER BY created_at DESC, id DESC LIMIT ?"
+        rows = self.db_manager.fetch_all(query, (last,))
+        return list(reversed(self._materialize(list(reversed(rows)))))
+
+    def get_all_in_date(self,
+                        year: Optional[int] = None,
+                        month: Optional[int] = None,
+                        day: Optional[int] = None) -> Iterator[tuple]:
+        """
+        get data with time parameter (index range scan on created_at)
+        rows are streamed, snapshots are rebuilt one at a time
+        """
         if year and month and day:
-            start_date = f"{year}-{month:02d}-{day:02d} 00:00:00"
-            end_date = f"{year}-{month:02d}-{day:02d} 23:59:59"
-            query = "SELECT id, timestamp, data FROM informations WHERE timestamp BETWEEN ? AND ? ORDER BY timestamp"
-            params = (start_date, end_date)
-        
+            start = datetime(year, month, day)
+            end = start + timedelta(days=1)
         elif year and month:
-            start_date = f"{year}-{month:02d}-01 00:00:00"
-            end_date = f"{year}-{month:02d}-28 23:59:59"
-            query = "SELECT id, timestamp, data FROM informations WHERE timestamp BETWEEN ? AND ? ORDER BY timestamp"
-            params = (start_date, end_date)
-        
+            start = datetime(year, month, 1)
+            end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
         elif year:
-            start_date = f"{year}-01-01 00:00:00"
-            end_date = f"{year}-12-31 23:59:59"
-            query = "SELECT id, timestamp, data FROM informations WHERE timestamp BETWEEN ? AND ? ORDER BY timestamp"
-            params = (start_date, end_date)
-        
+            start = datetime(year, 1, 1)
+            end = datetime(year + 1, 1, 1)
         else:
-            query = "SELECT id, timestamp, data FROM informations ORDER BY timestamp"
-            params = ()
+            query = f"SELECT {self.COLUMNS} FROM informations ORDER BY created_at, id"
+            return self._iter_materialize(self.db_manager.iter_rows(query))
+
+        # half-open [start, end): covers the whole last day of any month
+        query = f"SELECT {self.COLUMNS} FROM informations WHERE created_at >= ? AND created_at < ? ORDER BY created_at, id"
+        params = (int(start.timestamp()), int(end.timestamp()))
+        return self._iter_materialize(self.db_manager.iter_rows(query, params))
+
+    def get_snapshot(self, info_id: int) -> Optional[str]:
+        """rebuild one snapshot by id"""
+        if self._latest and self._latest[0] == info_id:
+            return self._latest[2]
+
+        # nearest keyframe at or before info_id, then replay deltas forward
+        query = f"""SELECT {self.COLUMNS} FROM informations
+                    WHERE id <= ? AND id >= (
+                        SELECT MAX(id) FROM informations WHERE id <= ? AND COALESCE(kind, 'full') != ?
+                    ) ORDER BY id"""
+        rows = self.db_manager.fetch_all(query, (info_id, info_id, KIND_DELTA))
+        if not rows or rows[-1][0] != info_id:
+            return None
+
+        text = None
+        prev_id = None
+        for row_id, _, kind, base_id, _, data, payload in rows:
+            if kind == KIND_DELTA:
+                if text is None or base_id != prev_id:
+                    raise ValueError(f"broken delta chain at informations.id={row_id}")
+                text = self._apply(text, payload)
+            else:
+                text = self._decode(kind, data, payload)
+            prev_id = row_id
+        self._remember(info_id, rows[-1][4], text)
+        return text
+
+    def get_snapshot_at(self, moment: datetime) -> Optional[tuple]:
+        """rebuild the newest snapshot taken at or before moment"""
+        query = "SELECT id, timestamp FROM informations WHERE created_at <= ? ORDER BY created_at DESC, id DESC LIMIT 1"
+        row = self.db_manager.fetch_one(query, (int(moment.timestamp()),))
+        if not row:
+            return None
+        return row[0], row[1], self.get_snapshot(row[0])
 
-        return self.db_manager.fetch_all(query, params)
+    @staticmethod
+    def content_hash(data: str) -> str:
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
 
-    def add_information(self, data: str):
+    def get_last_hash(self) -> Optional[Tuple[int, Optional[str]]]:
+        """(id, content_hash) of the newest snapshot, hash is None for rows older than the column"""
+        return self.db_manager.fetch_one("SELECT id, content_hash FROM informations ORDER BY id DESC LIMIT 1")
+
+    def touch(self, info_id: int):
+        """record that a run produced the same snapshot again (no new row)"""
+        query = "UPDATE informations SET seen_at = ? WHERE id = ?"
+        self.db_manager.execute(query, (int(datetime.now().timestamp()), info_id))
+
+    def add_information(self, data: str, content_hash: Optional[str] = None) -> int:
+        """:return: id of the new snapshot"""
         current_time = datetime.now()
         formatted_time = current_time.strftime("%Y-%m-%d %H:%M:%S")
+        created_at = int(current_time.timestamp())
+        content_hash = content_hash or self.content_hash(data)
+
+        if self.storage != "delta":
+            query = "INSERT INTO informations (timestamp, created_at, content_hash, kind, data) VALUES (?, ?, ?, ?, ?)"
+            cursor = self.db_manager.execute(query, (formatted_time, created_at, content_hash, KIND_FULL, data))
+            self._latest = None
+            return cursor.lastrowid
+
+        query = "INSERT INTO informations (timestamp, created_at, content_hash, kind, base_id, depth, payload) VALUES (?, ?, ?, ?, ?, ?, ?)"
+        with self.db_manager.transaction() as conn:
+            previous = self._get_latest()
+            if previous is None or previous[1] + 1 >= self.keyframe_interval:
+                params = (formatted_time, created_at, content_hash, KIND_KEYFRAME, None, 0, compress_text(data))
+                depth = 0
+            else:
+                ops = make_delta(previous[2].split("\n"), data.split("\n"))
+                depth = previous[1] + 1
+                params = (formatted_time, created_at, content_hash, KIND_DELTA, previous[0], depth, compress_delta(ops))
+
+            cursor = conn.execute(query, params)
+            self._latest = (cursor.lastrowid, depth, data)
+        return cursor.lastrowid
+
+    def _get_latest(self) -> Optional[Tuple[int, int, str]]:
+        """(id, depth, text) of the newest row, cached between calls"""
+        row = self.db_manager.fetch_one("SELECT id, depth FROM informations ORDER BY id DESC LIMIT 1")
+        if row is None:
+            return None
+        if self._latest is None or self._latest[0] != row[0]:
+            self._latest = (row[0], row[1] or 0, self.get_snapshot(row[0]) or "")
+        return self._latest
+
+    def _remember(self, info_id: int, depth: Optional[int], text: str):
+        """keep a rebuilt snapshot as _latest when it is newer (_get_latest checks it is the newest)"""
+        if self._latest is None or info_id > self._latest[0]:
+            self._latest = (info_id, depth or 0, text)
+
+    def _materialize(self, rows: list) -> List[tuple]:
+        """(id, timestamp, kind, base_id, depth, data, payload) rows in id order -> (id, timestamp, data)"""
+        return list(self._iter_materialize(rows))
+
+    def _iter_materialize(self, rows: Iterable[tuple]) -> Iterator[tuple]:
+        """streaming _materialize, only the previous snapshot is kept"""
+        prev_id, prev_text = None, None
+        for row_id, timestamp, kind, base_id, depth, data, payload in rows:
+            if kind == KIND_DELTA:
+                if base_id == prev_id and prev_text is not None:
+                    text = self._apply(prev_text, payload)
+                else:
+                    text = self.get_snapshot(row_id)
+            else:
+                text = self._decode(kind, data, payload)
+            self._remember(row_id, depth, text)
+            yield row_id, timestamp, text
+            prev_id, prev_text = row_id, text
+
+    @staticmethod
+    def _decode(kind: Optional[str], data: Optional[str], payload: Optional[bytes]) -> str:
+        if kind == KIND_KEYFRAME:
+            return decompress_text(payload)
+        return data  # KIND_FULL / legacy rows
 
-        query = "INSERT INTO informations (timestamp, data) VALUES (?, ?)"
-        self.db_manager.execute(query, (formatted_time, data))
+    @staticmethod
+    def _apply(text: str, payload: bytes) -> str:
+        return "\n".join(apply_delta(text.split("\n"), decompress_delta(payload)))
@@ -0,0 +1,236 @@
+import sqlite3
+import time
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+# Versioned schema migrations, the applied version lives in PRAGMA user_version.
+# Append new steps at the end, never edit a released one.
+# Every step must also work on databases created before this module existed
+# (user_version 0 with some tables already there).
+
+def add_missing_columns(cursor: sqlite3.Cursor, table: str, columns: dict):
+    """ALTER TABLE for databases created before a column existed"""
+    existing = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    for name, definition in columns.items():
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+def _v1_base_tables(cursor: sqlite3.Cursor):
+    # Users TABLE
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT,
+            chat_id INTEGER UNIQUE,
+            flags TEXT DEFAULT "0000"
+        )
+    ''')
+
+    # Settings TABLE
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+
+    # informations TABLE
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS informations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT,
+            data TEXT
+        )
+    ''')
+
+def _v2_delta_storage(cursor: sqlite3.Cursor):
+    # kind/base_id/depth/payload: delta storage, see InformationDateManager
+    add_missing_columns(cursor, "informations", {
+        "kind": 'TEXT DEFAULT "full"',
+        "base_id": "INTEGER",
+        "depth": "INTEGER DEFAULT 0",
+        "payload": "BLOB",
+    })
+
+def _to_epoch(timestamp: str) -> int:
+    """'%Y-%m-%d %H:%M:%S' local time (as written by datetime.now()) -> epoch seconds"""
+    try:
+        return int(time.mktime(datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").timetuple()))
+    except (TypeError, ValueError):
+        return 0
+
+def _v3_epoch_timestamps_and_indexes(cursor: sqlite3.Cursor):
+    # created_at: integer epoch, the text `timestamp` stays for display
+    add_missing_columns(cursor, "informations", {"created_at": "INTEGER"})
+    rows = cursor.execute("SELECT id, timestamp FROM informations WHERE created_at IS NULL").fetchall()
+    cursor.executemany("UPDATE informations SET created_at = ? WHERE id = ?",
+                       [(_to_epoch(timestamp), row_id) for row_id, timestamp in rows])
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_informations_created_at ON informations (created_at)")
+
+def _v4_content_hash(cursor: sqlite3.Cursor):
+    # content_hash: sha256 of the snapshot text, seen_at: last run that produced it
+    add_missing_columns(cursor, "informations", {
+        "content_hash": "TEXT",
+        "seen_at": "INTEGER",
+    })
+
+def _v5_program_index(cursor: sqlite3.Cursor):
+    # incremental extraction: one row per program identity, see ProgramIndexManager
+    # (row: JSON list of the projected values, in BrowserConfig.fields order)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS programs (
+            identity TEXT PRIMARY KEY,
+            last_update_at TEXT,
+            active INTEGER,
+            row TEXT,
+            position INTEGER
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_programs_position ON programs (position)")
+
+def _v6_pending_updates(cursor: sqlite3.Cursor):
+    # getUpdates batches handed to the dispatcher, committed with the offset
+    # and deleted once handled, see PendingUpdateManager
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS pending_updates (
+            update_id INTEGER PRIMARY KEY,
+            chat_id INTEGER,
+            payload TEXT
+        )
+    ''')
+
+def _v7_outbox(cursor: sqlite3.Cursor):
+    # every outgoing message chunk, drained by OutboxWorker, see OutboxManager:
+    # the text is stored once per (broadcast_id, flag_mask) in outbox_messages,
+    # outbox_broadcasts holds the broadcasts expanded into outbox rows, (flag_mask,
+    # after_chat_id) is where OutboxManager.expand continues
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            broadcast_id TEXT NOT NULL,
+            chat_id INTEGER NOT NULL,
+            flag_mask INTEGER NOT NULL DEFAULT 0,
+            chunk INTEGER NOT NULL,
+            status TEXT DEFAULT "pending",
+            attempts INTEGER DEFAULT 0,
+            next_attempt_at REAL DEFAULT 0,
+            lease_until REAL,
+            created_at INTEGER,
+            sent_at INTEGER,
+            error TEXT,
+            UNIQUE (broadcast_id, chat_id, chunk)
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_outbox_status ON outbox (status, next_attempt_at)")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS outbox_messages (
+            broadcast_id TEXT NOT NULL,
+            flag_mask INTEGER NOT NULL,
+            chunk INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            PRIMARY KEY (broadcast_id, flag_mask, chunk)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS outbox_broadcasts (
+            broadcast_id TEXT PRIMARY KEY,
+            priority INTEGER DEFAULT 1,
+            flag_mask INTEGER DEFAULT 0,
+            after_chat_id INTEGER,
+            created_at INTEGER,
+            expanded_at INTEGER
+        )
+    ''')
+
+def _v8_flag_mask(cursor: sqlite3.Cursor):
+    # flag_mask: integer bitmask of the flags string (configs.typing_utils.UserFlag),
+    # flags stays in sync for tools that read it; (flag_mask, chat_id) covers audience queries
+    add_missing_columns(cursor, "users", {"flag_mask": "INTEGER DEFAULT 0"})
+    cursor.execute('''
+        UPDATE users SET flag_mask =
+              (substr(flags, 1, 1) = '1')
+            | ((substr(flags, 2, 1) = '1') << 1)
+            | ((substr(flags, 3, 1) = '1') << 2)
+            | ((substr(flags, 4, 1) = '1') << 3)
+        WHERE flags IS NOT NULL
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_flag_mask ON users (flag_mask, chat_id)")
+
+def _v9_outbox_priority(cursor: sqlite3.Cursor):
+    # 0 = command replies, 1 = broadcasts; OutboxWorker drains each priority in its own lane
+    add_missing_columns(cursor, "outbox", {"priority": "INTEGER DEFAULT 1"})
+    cursor.execute("UPDATE outbox SET priority = 0 WHERE broadcast_id LIKE 'update:%'")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, priority, id)")
+
+def _v10_users_version(cursor: sqlite3.Cursor):
+    # settings.users_version counts writes to users from any connection,
+    # UserManager reloads its cache when someone else (sql_cli) moved it
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS users_version_{event.lower()} AFTER {event} ON users
+            BEGIN
+                INSERT INTO settings (key, value) VALUES ('users_version', 1)
+                ON CONFLICT (key) DO UPDATE SET value = value + 1;
+            END
+        ''')
+
+def _flags_to_mask_sql(flags: str) -> str:
+    """SQL expression of configs.typing_utils.flags_to_mask"""
+    return " | ".join(f"((substr({flags}, {bit + 1}, 1) = '1') << {bit})" for bit in range(4))
+
+def _v11_flag_mask_sync(cursor: sqlite3.Cursor):
+    # flag_mask drives audiences; keep it in sync when only flags is written
+    # (sql_cli edits), the WHEN guard skips the bot's own consistent writes
+    new_mask = _flags_to_mask_sql("NEW.flags")
+    for event in ("INSERT", "UPDATE OF flags"):
+        name = "users_flag_mask_" + event.split()[0].lower()
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON users
+            WHEN NEW.flags IS NOT NULL AND NEW.flag_mask IS NOT ({new_mask})
+            BEGIN
+                UPDATE users SET flag_mask = {new_mask} WHERE id = NEW.id;
+            END
+        ''')
+
+def _v12_handled_updates(cursor: sqlite3.Cursor):
+    # handled updates stay as markers for a while, so a re-delivered one is ignored,
+    # error: the update was given up after its last attempt (dead letter)
+    add_missing_columns(cursor, "pending_updates", {"handled_at": "INTEGER", "error": "TEXT"})
+
+MIGRATIONS: List[Tuple[int, Callable[[sqlite3.Cursor], None]]] = [
+    (1, _v1_base_tables),
+    (2, _v2_delta_storage),
+    (3, _v3_epoch_timestamps_and_indexes),
+    (4, _v4_content_hash),
+    (5, _v5_program_index),
+    (6, _v6_pending_updates),
+    (7, _v7_outbox),
+    (8, _v8_flag_mask),
+    (9, _v9_outbox_priority),
+    (10, _v10_users_version),
+    (11, _v11_flag_mask_sync),
+    (12, _v12_handled_updates),
+]
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    Apply pending migrations, each one in its own transaction.
+
+    :return: schema version after migrating.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target, step in MIGRATIONS:
+        if target <= version:
+            continue
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            step(cursor)
+            cursor.execute(f"PRAGMA user_version = {target}")
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+        version = target
+    return version
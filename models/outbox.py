@@ -0,0 +1,190 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+import time
+
+from models.db import DatabaseManager
+
+STATUS_PENDING = "pending"
+STATUS_SENDING = "sending"  # claimed by a worker until lease_until
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+
+# lower is sent first, each priority is drained by its own OutboxWorker lane
+PRIORITY_REPLY = 0
+PRIORITY_BROADCAST = 1
+
+# below every chat_id (group chats are negative), start of an audience
+_FIRST_CHAT = -2 ** 63
+
+class OutboxManager:
+    """
+    manage outbox, outbox_messages and outbox_broadcasts TABLES
+
+    The text of a message is stored once per (broadcast_id, flag_mask) in
+    outbox_messages, one outbox row per recipient and chunk references it.
+    (broadcast_id, chat_id, chunk) is unique, so enqueueing the same broadcast
+    again (replayed update, crashed run) is a no-op.
+
+    A broadcast is queued as its messages plus a small outbox_broadcasts
+    marker (cheap enough to commit with the snapshot); expand() turns the
+    marker into recipient rows in short transactions of a bounded size, so
+    the write lock is never held for a whole fan-out.
+
+    Rows are sent in (priority, id) order: command replies never queue behind
+    a broadcast. Within a priority, a chat whose oldest pending row waits for
+    a retry, or is being sent by another worker, holds back its later rows.
+    A worker claims rows before sending them, so two processes (the bot and
+    a standalone broadcast run) never send the same row; the claim of a
+    worker that died expires after its lease.
+    """
+    def __init__(self, db_manager: DatabaseManager):
+        self.db_manager = db_manager
+
+    def enqueue(self, broadcast_id: str, chat_id: int, chunks: List[str],
+                priority: int = PRIORITY_REPLY) -> int:
+        """
+        one message to one chat (command replies), stored under flag_mask 0
+        :param chunks: already split to < 4096 chars.
+        :return: rows added (duplicates are ignored).
+        """
+        query = '''INSERT OR IGNORE INTO outbox (broadcast_id, chat_id, flag_mask, chunk, created_at, priority)
+                   VALUES (?, ?, 0, ?, ?, ?)'''
+        now = int(time.time())
+        with self.db_manager.transaction() as conn:
+            self._add_messages(broadcast_id, {0: chunks})
+            before = conn.total_changes
+            self.db_manager.executemany(query, ((broadcast_id, chat_id, index, now, priority)
+                                                for index in range(len(chunks))))
+            return conn.total_changes - before
+
+    def queue_broadcast(self, broadcast_id: str, messages: Dict[int, List[str]],
+                        priority: int = PRIORITY_BROADCAST) -> bool:
+        """
+        :param messages: flag mask -> chunks, every user of that mask gets them.
+        :return: False when this broadcast was already queued.
+        """
+        query = '''INSERT OR IGNORE INTO outbox_broadcasts (broadcast_id, priority, flag_mask, created_at)
+                   VALUES (?, ?, 0, ?)'''
+        with self.db_manager.transaction():
+            if self.db_manager.execute(query, (broadcast_id, priority, int(time.time()))).rowcount == 0:
+                return False
+            self._add_messages(broadcast_id, messages)
+        return True
+
+    def _add_messages(self, broadcast_id: str, messages: Dict[int, List[str]]):
+        query = "INSERT OR IGNORE INTO outbox_messages (broadcast_id, flag_mask, chunk, text) VALUES (?, ?, ?, ?)"
+        self.db_manager.executemany(query, ((broadcast_id, flag_mask, index, text)
+                                            for flag_mask, chunks in messages.items()
+                                            for index, text in enumerate(chunks)))
+
+    def expand(self, priority: int, limit: int) -> bool:
+        """
+        Add the rows of up to `limit` recipients of the oldest queued broadcast
+        of one priority (one transaction, continues where the last call stopped).
+        Recipients are the users of each flag mask, read from idx_users_flag_mask.
+        :return: False when no broadcast of this priority is left to expand.
+        """
+        marker_query = '''SELECT broadcast_id, flag_mask, after_chat_id FROM outbox_broadcasts
+                          WHERE expanded_at IS NULL AND priority = ?
+                          ORDER BY created_at, broadcast_id LIMIT 1'''
+        chunks_query = '''SELECT flag_mask, chunk FROM outbox_messages
+                          WHERE broadcast_id = ? AND flag_mask >= ? ORDER BY flag_mask, chunk'''
+        audience_query = "SELECT chat_id FROM users WHERE flag_mask = ? AND chat_id > ? ORDER BY chat_id LIMIT ?"
+        insert_query = '''INSERT OR IGNORE INTO outbox (broadcast_id, chat_id, flag_mask, chunk, created_at, priority)
+                          VALUES (?, ?, ?, ?, ?, ?)'''
+
+        with self.db_manager.transaction():
+            marker = self.db_manager.fetch_one(marker_query, (priority,))
+            if marker is None:
+                return False
+            broadcast_id, cursor_mask, after_chat_id = marker
+
+            chunks: Dict[int, List[int]] = {}
+            for flag_mask, chunk in self.db_manager.fetch_all(chunks_query, (broadcast_id, cursor_mask)):
+                chunks.setdefault(flag_mask, []).append(chunk)
+
+            now = int(time.time())
+            for flag_mask, mask_chunks in chunks.items():
+                after = after_chat_id if flag_mask == cursor_mask and after_chat_id is not None else _FIRST_CHAT
+                chat_ids = [chat_id for (chat_id,) in self.db_manager.fetch_all(audience_query, (flag_mask, after, limit))]
+                # chunks of one chat get consecutive ids: they are sent in order
+                self.db_manager.executemany(insert_query, ((broadcast_id, chat_id, flag_mask, chunk, now, priority)
+                                                           for chat_id in chat_ids for chunk in mask_chunks))
+                limit -= len(chat_ids)
+                if limit <= 0:
+                    self.db_manager.execute("UPDATE outbox_broadcasts SET flag_mask = ?, after_chat_id = ? WHERE broadcast_id = ?",
+                                            (flag_mask, chat_ids[-1], broadcast_id))
+                    return True
+            self.db_manager.execute("UPDATE outbox_broadcasts SET expanded_at = ? WHERE broadcast_id = ?",
+                                    (now, broadcast_id))
+        return True
+
+    def claim(self, limit: int, priority: int, lease: float,
+              now: Optional[float] = None) -> List[Tuple[int, int, str, int]]:
+        """
+        Mark up to `limit` due rows of one priority as being sent by the caller.
+        Due: pending (or claimed by a worker whose lease expired), and no
+        earlier row of the same chat waits for a retry or is being sent.
+        :param lease: Seconds the claim holds, longer than sending one batch takes.
+        :return: (id, chat_id, text, attempts) of the claimed rows, in id order.
+        """
+        query = '''SELECT o.id, o.chat_id, m.text, o.attempts FROM outbox o
+                   JOIN outbox_messages m
+                     ON m.broadcast_id = o.broadcast_id AND m.flag_mask = o.flag_mask AND m.chunk = o.chunk
+                   WHERE o.status = ? AND o.priority = ? AND o.chat_id NOT IN (
+                       SELECT chat_id FROM outbox WHERE status = ? AND priority = ? AND next_attempt_at > ?
+                       UNION ALL
+                       SELECT chat_id FROM outbox WHERE status = ? AND priority = ?)
+                   ORDER BY o.id LIMIT ?'''
+        now = time.time() if now is None else now
+        with self.db_manager.transaction():
+            # claims of a worker that died go back to pending
+            self.db_manager.execute("UPDATE outbox SET status = ? WHERE status = ? AND priority = ? AND lease_until <= ?",
+                                    (STATUS_PENDING, STATUS_SENDING, priority, now))
+            rows = self.db_manager.fetch_all(query, (STATUS_PENDING, priority,
+                                                     STATUS_PENDING, priority, now,
+                                                     STATUS_SENDING, priority, limit))
+            self.db_manager.executemany("UPDATE outbox SET status = ?, lease_until = ? WHERE id = ?",
+                                        ((STATUS_SENDING, now + lease, row[0]) for row in rows))
+        return rows
+
+    def release(self, row_ids: Iterable[int]):
+        """give claimed rows that were not sent back to the pending queue"""
+        query = "UPDATE outbox SET status = ? WHERE id = ? AND status = ?"
+        self.db_manager.executemany(query, ((STATUS_PENDING, row_id, STATUS_SENDING) for row_id in row_ids))
+
+    def next_attempt_at(self, priority: int, now: Optional[float] = None) -> Optional[float]:
+        """earliest future retry of a pending row of one priority (None = nothing scheduled)"""
+        query = "SELECT MIN(next_attempt_at) FROM outbox WHERE status = ? AND priority = ? AND next_attempt_at > ?"
+        now = time.time() if now is None else now
+        row = self.db_manager.fetch_one(query, (STATUS_PENDING, priority, now))
+        return row[0] if row else None
+
+    def mark_sent(self, row_id: int):
+        query = "UPDATE outbox SET status = ?, attempts = attempts + 1, sent_at = ?, error = NULL WHERE id = ?"
+        self.db_manager.execute(query, (STATUS_SENT, int(time.time()), row_id))
+
+    def retry_later(self, row_id: int, delay: float, error: str):
+        query = "UPDATE outbox SET status = ?, attempts = attempts + 1, next_attempt_at = ?, error = ? WHERE id = ?"
+        self.db_manager.execute(query, (STATUS_PENDING, time.time() + delay, error, row_id))
+
+    def mark_failed(self, row_id: int, error: str):
+        query = "UPDATE outbox SET status = ?, attempts = attempts + 1, error = ? WHERE id = ?"
+        self.db_manager.execute(query, (STATUS_FAILED, error, row_id))
+
+    def counts(self) -> Dict[str, int]:
+        """rows per status"""
+        query = "SELECT status, COUNT(*) FROM outbox GROUP BY status"
+        return {status: count for status, count in self.db_manager.fetch_all(query)}
+
+    def purge_sent(self, older_than: float):
+        """drop sent rows older than `older_than` seconds, then the messages and markers nobody references"""
+        cutoff = int(time.time() - older_than)
+        self.db_manager.execute("DELETE FROM outbox WHERE status = ? AND sent_at < ?", (STATUS_SENT, cutoff))
+        self.db_manager.execute('''DELETE FROM outbox_broadcasts WHERE expanded_at < ? AND NOT EXISTS (
+                                       SELECT 1 FROM outbox WHERE outbox.broadcast_id = outbox_broadcasts.broadcast_id)''',
+                                (cutoff,))
+        self.db_manager.execute('''DELETE FROM outbox_messages WHERE NOT EXISTS (
+                                       SELECT 1 FROM outbox WHERE outbox.broadcast_id = outbox_messages.broadcast_id
+                                   ) AND NOT EXISTS (
+                                       SELECT 1 FROM outbox_broadcasts
+                                       WHERE outbox_broadcasts.broadcast_id = outbox_messages.broadcast_id)''')
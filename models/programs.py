@@ -0,0 +1,38 @@
+import json
+
+from models.db import DatabaseManager
+from configs.typing_utils import ProgramEntries
+
+class ProgramIndexManager:
+    """
+    manage programs TABLE
+
+    identity -> (last_update_at, active, row values) of every program seen
+    by the last extraction, kept in snapshot order (position).
+    Values are stored as JSON so their types survive the round trip.
+    """
+    def __init__(self, db_manager: DatabaseManager):
+        self.db_manager = db_manager
+
+    def load(self) -> ProgramEntries:
+        query = "SELECT identity, last_update_at, active, row FROM programs ORDER BY position"
+        entries = {}
+        for identity, last_update_at, active, row in self.db_manager.fetch_all(query):
+            entries[json.loads(identity)] = (json.loads(last_update_at), bool(active), tuple(json.loads(row)))
+        return entries
+
+    def save(self, entries: ProgramEntries, complete: bool):
+        """
+        Store entries (positions follow their order).
+        complete=True means entries is the whole catalogue: other rows are deleted.
+        """
+        query = '''REPLACE INTO programs (identity, last_update_at, active, row, position)
+                   VALUES (?, ?, ?, ?, ?)'''
+        params = (
+            (json.dumps(identity), json.dumps(last_update_at), int(active), json.dumps(row), position)
+            for position, (identity, (last_update_at, active, row)) in enumerate(entries.items())
+        )
+        with self.db_manager.transaction():
+            if complete:
+                self.db_manager.execute("DELETE FROM programs")
+            self.db_manager.executemany(query, params)
@@ -0,0 +1,58 @@
+import difflib
+import json
+import zlib
+from typing import List
+
+# delta ops:
+#   ["c", i1, i2]     copy old_lines[i1:i2]
+#   ["i", [lines]]    insert new lines
+
+def make_delta(old_lines: List[str], new_lines: List[str]) -> list:
+    """Line delta from old to new (common prefix/suffix trimmed before matching)."""
+    prefix = 0
+    limit = min(len(old_lines), len(new_lines))
+    while prefix < limit and old_lines[prefix] == new_lines[prefix]:
+        prefix += 1
+
+    suffix = 0
+    limit -= prefix
+    while suffix < limit and old_lines[-1 - suffix] == new_lines[-1 - suffix]:
+        suffix += 1
+
+    ops: list = []
+    if prefix:
+        ops.append(["c", 0, prefix])
+
+    old_mid = old_lines[prefix:len(old_lines) - suffix]
+    new_mid = new_lines[prefix:len(new_lines) - suffix]
+    matcher = difflib.SequenceMatcher(None, old_mid, new_mid, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append(["c", prefix + i1, prefix + i2])
+        elif j2 > j1:  # replace / insert
+            ops.append(["i", new_mid[j1:j2]])
+
+    if suffix:
+        ops.append(["c", len(old_lines) - suffix, len(old_lines)])
+    return ops
+
+def apply_delta(old_lines: List[str], ops: list) -> List[str]:
+    new_lines: List[str] = []
+    for op in ops:
+        if op[0] == "c":
+            new_lines.extend(old_lines[op[1]:op[2]])
+        else:
+            new_lines.extend(op[1])
+    return new_lines
+
+def compress_text(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"))
+
+def decompress_text(payload: bytes) -> str:
+    return zlib.decompress(payload).decode("utf-8")
+
+def compress_delta(ops: list) -> bytes:
+    return zlib.compress(json.dumps(ops, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+def decompress_delta(payload: bytes) -> list:
+    return json.loads(zlib.decompress(payload).decode("utf-8"))
@@ -0,0 +1,49 @@
+from typing import List
+import json
+import time
+
+from models.db import DatabaseManager
+
+class PendingUpdateManager:
+    """
+    manage pending_updates TABLE
+
+    Telegram updates that were acknowledged (offset moved past them) but not
+    handled yet. A batch is added in the same transaction as the new offset,
+    each update is marked handled in the same transaction as the writes of
+    its handler, so a crash never loses one and never applies one twice.
+    Handled rows are kept for a while: INSERT OR IGNORE then drops a
+    re-delivered update (webhook retry) instead of handling it again.
+    An update its handler keeps failing on is marked handled with the error
+    (dead letter): it is not replayed on every restart, and stays for sql_cli.
+    """
+    def __init__(self, db_manager: DatabaseManager):
+        self.db_manager = db_manager
+
+    def add_many(self, updates: List[dict]):
+        query = "INSERT OR IGNORE INTO pending_updates (update_id, chat_id, payload) VALUES (?, ?, ?)"
+        params = (
+            (update["update_id"], update.get("message", {}).get("chat", {}).get("id"), json.dumps(update))
+            for update in updates
+        )
+        self.db_manager.executemany(query, params)
+
+    def load(self) -> List[dict]:
+        """unhandled updates in arrival order"""
+        query = "SELECT payload FROM pending_updates WHERE handled_at IS NULL ORDER BY update_id"
+        return [json.loads(payload) for (payload,) in self.db_manager.fetch_all(query)]
+
+    def done(self, update_id: int) -> bool:
+        """:return: False when the update was already handled (replay)"""
+        query = "UPDATE pending_updates SET handled_at = ? WHERE update_id = ? AND handled_at IS NULL"
+        return self.db_manager.execute(query, (int(time.time()), update_id)).rowcount > 0
+
+    def give_up(self, update_id: int, error: str):
+        """dead-letter an update whose handler kept failing"""
+        query = "UPDATE pending_updates SET handled_at = ?, error = ? WHERE update_id = ? AND handled_at IS NULL"
+        self.db_manager.execute(query, (int(time.time()), error, update_id))
+
+    def purge_handled(self, older_than: float):
+        """forget handled updates older than `older_than` seconds (dead letters are kept)"""
+        query = "DELETE FROM pending_updates WHERE handled_at < ? AND error IS NULL"
+        self.db_manager.execute(query, (int(time.time() - older_than),))
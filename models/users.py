@@ -1,49 +1,199 @@
-from typing import List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from contextlib import contextmanager
 from datetime import datetime
+import threading
 
 from models.db import DatabaseManager
+from configs.typing_utils import flags_to_mask, mask_to_flags
 
 class User:
     """show one user datails"""
-    def __init__(self, 
+    # no per-instance __dict__: ~1M cached users stay small
+    __slots__ = ("id", "chat_id", "timestamp", "flag_mask")
+
+    def __init__(self,
                  id: int = 0,
-                 chat_id: int = 0, 
-                 timestamp: str = '', 
-                 flags: str = "0000"):
-    
+                 chat_id: int = 0,
+                 timestamp: str = '',
+                 flags: str = "0000",
+                 flag_mask: Optional[int] = None):
+
         self.id = id
         self.chat_id = chat_id
         self.timestamp = timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.flags = flags
+        self.flag_mask = int(flags_to_mask(flags) if flag_mask is None else flag_mask)  # UserFlag bits
+
+    @property
+    def flags(self) -> str:
+        """legacy "1010" view of flag_mask"""
+        return mask_to_flags(self.flag_mask)
 
     def update_flags(self, new_flags: str):
-        self.flags = new_flags
+        self.flag_mask = flags_to_mask(new_flags)
 
 class UserManager:
-    """manage users TABLE"""
+    """
+    manage users TABLE
+
+    Write-through cache: the whole table is loaded once (chat_id -> User) and
+    every write through this manager updates DB and cache together, so
+    get_user is a dict lookup plus one read of settings.users_version.
+    Triggers bump that counter on every write to users, from any connection:
+    when it moved without us (sql_cli edits), the table is reloaded. The
+    counter values of our own writes are remembered, so neither the writing
+    thread (inside its transaction) nor the others (once it committed)
+    take them for somebody else's write.
+    """
+    SELECT = "SELECT id, timestamp, chat_id, flag_mask FROM users"
+    VERSION = "SELECT value FROM settings WHERE key = 'users_version'"
+
     def __init__(self, db_manager: DatabaseManager):
         self.db_manager = db_manager
+        self._cache: Optional[Dict[int, User]] = None
+        self._version = None  # users_version the cache matches
+        self._lock = threading.Lock()
+        self._own_versions = set()  # users_version of our writes, not adopted yet
+
+    def _read_version(self):
+        row = self.db_manager.fetch_one(self.VERSION)
+        return row[0] if row else None
+
+    def _current(self, version) -> bool:
+        """the cache matches this users_version (own writes included)"""
+        return version == self._version or version in self._own_versions
+
+    def _users(self) -> Dict[int, User]:
+        version = self._read_version()
+        cache = self._cache
+        if cache is None or not self._current(version):
+            with self._lock:
+                version = self._read_version()  # the first read may predate our own commit
+                if self._cache is None or not self._current(version):
+                    self._cache = {row[2]: self._from_row(row) for row in self.db_manager.iter_rows(self.SELECT)}
+                    self._version = version
+                cache = self._cache
+        return cache
+
+    @contextmanager
+    def _writing(self):
+        """
+        own write: the cache stays valid (the caller updates it) unless
+        somebody else wrote to users since it was loaded
+        """
+        with self.db_manager.transaction():
+            before = self._read_version()
+            yield
+            after = self._read_version()
+            if self._current(before):
+                with self._lock:
+                    self._own_versions.add(after)
+                self.db_manager.after_commit(lambda: self._adopt(before, after))
+            else:
+                self.db_manager.after_commit(self.invalidate)
+
+    def _adopt(self, before, after):
+        """after the commit: our write moved users_version from before to after"""
+        with self._lock:
+            self._own_versions.discard(after)
+            if self._version == before:
+                self._version = after
+            elif self._version != after:
+                self._cache = None  # somebody else wrote meanwhile
+
+    @staticmethod
+    def _from_row(row: tuple) -> User:
+        return User(id=row[0], timestamp=row[1], chat_id=row[2], flag_mask=row[3] or 0)
+
+    def invalidate(self):
+        """drop the cache, the next read reloads the table (e.g. after a rollback)"""
+        with self._lock:
+            self._cache = None
+            self._own_versions.clear()
 
     def add_user(self, user: User):
-        query = '''INSERT INTO users (timestamp, chat_id, flags) 
-                   VALUES (?, ?, ?)'''
-        self.db_manager.execute(query, (user.timestamp, user.chat_id, user.flags))
+        query = '''INSERT INTO users (timestamp, chat_id, flags, flag_mask)
+                   VALUES (?, ?, ?, ?)'''
+        users = self._users()
+        with self._writing():
+            cursor = self.db_manager.execute(query, (user.timestamp, user.chat_id, user.flags, user.flag_mask))
+        with self._lock:
+            users[user.chat_id] = User(id=cursor.lastrowid, chat_id=user.chat_id,
+                                       timestamp=user.timestamp, flag_mask=user.flag_mask)
+
+    def add_users(self, users: Iterable[User]):
+        """bulk insert, chat_ids already in the table are skipped"""
+        query = '''INSERT OR IGNORE INTO users (timestamp, chat_id, flags, flag_mask)
+                   VALUES (?, ?, ?, ?)'''
+        cache = self._users()
+        new_users = [user for user in users if user.chat_id not in cache]
+        if not new_users:
+            return
+        with self._writing():
+            self.db_manager.executemany(query, ((user.timestamp, user.chat_id, user.flags, user.flag_mask)
+                                                for user in new_users))
+
+        # ids come from AUTOINCREMENT, read the rows back (999 = SQLite parameter limit)
+        chat_ids = [user.chat_id for user in new_users]
+        for start in range(0, len(chat_ids), 999):
+            batch = chat_ids[start:start + 999]
+            rows = self.db_manager.fetch_all(f"{self.SELECT} WHERE chat_id IN ({','.join('?' * len(batch))})", tuple(batch))
+            with self._lock:
+                for row in rows:
+                    cache[row[2]] = self._from_row(row)
 
     def get_user(self, chat_id: int) -> Optional[User]:
-        query = "SELECT id, timestamp, chat_id, flags FROM users WHERE chat_id = ?"
-        result = self.db_manager.fetch_one(query, (chat_id,))
-        if result:
-            return User(id=result[0] ,timestamp=result[1], chat_id=result[2], flags=result[3])
-        return None
-
-    def get_all_users(self) -> List[User]:
-        query = "SELECT id, timestamp, chat_id, flags FROM users"
-        results = self.db_manager.fetch_all(query)
-        all_users = []
-        for row in results:
-            all_users.append(User(id=row[0], timestamp=row[1], chat_id=row[2], flags=row[3]))
-        return all_users
+        return self._users().get(chat_id)
+
+    def get_all_users(self, batch_size: int = 500) -> Iterator[User]:
+        """every user in id order, streamed by keyset pages (bounded memory)"""
+        query = f"{self.SELECT} WHERE id > ? ORDER BY id LIMIT ?"
+        for row in self.db_manager.iter_keyset(query, batch_size=batch_size):
+            yield self._from_row(row)
+
+    def get_page(self, page: int, page_size: int) -> List[User]:
+        """one page of users in id order (page starts at 1)"""
+        # page numbers need OFFSET, it only walks the rowid b-tree
+        query = f"{self.SELECT} ORDER BY id LIMIT ? OFFSET ?"
+        rows = self.db_manager.fetch_all(query, (page_size, (max(page, 1) - 1) * page_size))
+        return [self._from_row(row) for row in rows]
+
+    def update_mask(self, chat_id: int, flag_mask: int):
+        self.update_masks_many([(chat_id, flag_mask)])
 
     def update_flags(self, chat_id: int, new_flags: str):
-        query = "UPDATE users SET flags = ? WHERE chat_id = ?"
-        self.db_manager.execute(query, (new_flags, chat_id))
\ No newline at end of file
+        self.update_mask(chat_id, flags_to_mask(new_flags))
+
+    def update_masks_many(self, changes: Iterable[Tuple[int, int]]):
+        """bulk update, changes = (chat_id, flag_mask) pairs (the flags string follows)"""
+        changes = [(chat_id, int(flag_mask)) for chat_id, flag_mask in changes]
+        query = "UPDATE users SET flag_mask = ?, flags = ? WHERE chat_id = ?"
+        users = self._users()
+        with self._writing():
+            self.db_manager.executemany(query, ((flag_mask, mask_to_flags(flag_mask), chat_id)
+                                                for chat_id, flag_mask in changes))
+        for chat_id, flag_mask in changes:
+            user = users.get(chat_id)
+            if user is not None:
+                user.flag_mask = flag_mask
+
+    def update_flags_many(self, changes: Iterable[Tuple[int, str]]):
+        """bulk update, changes = (chat_id, new_flags) pairs"""
+        self.update_masks_many((chat_id, flags_to_mask(new_flags)) for chat_id, new_flags in changes)
+
+    # ==============================
+    # Audiences (idx_users_flag_mask)
+    # ==============================
+    def audience_masks(self) -> List[int]:
+        """distinct flag masks in use (at most 16)"""
+        query = "SELECT DISTINCT flag_mask FROM users ORDER BY flag_mask"
+        return [flag_mask for (flag_mask,) in self.db_manager.fetch_all(query)]
+
+    def count_by_mask(self) -> Dict[int, int]:
+        """flag mask -> users (answered from idx_users_flag_mask)"""
+        query = "SELECT flag_mask, COUNT(*) FROM users GROUP BY flag_mask"
+        return {flag_mask: count for flag_mask, count in self.db_manager.fetch_all(query)}
+
+    def get_audience(self, flag_mask: int) -> List[int]:
+        """chat_ids of exactly this flag combination"""
+        query = "SELECT chat_id FROM users WHERE flag_mask = ? ORDER BY chat_id"
+        return [chat_id for (chat_id,) in self.db_manager.fetch_all(query, (flag_mask,))]
@@ -0,0 +1,45 @@
+from typing import Callable, Dict
+import importlib
+import threading
+
+from configs.browser_config import BrowserConfig
+from core.utills import update_url
+
+# ==============================
+# Fetch backend registry
+# ==============================
+# name -> "module:function", imported on first use only, so starting the bot
+# does not pay for requests / playwright before the first extraction.
+# A backend is called as fetch(config, page=1, **options) and returns the
+# parsed page dict (or an {"error": ...} dict).
+
+FetchFunc = Callable[..., dict]
+
+BACKENDS: Dict[str, str] = {
+    "api": "plugin.extract_data.get_data_api:fetch_from_api",
+    "browser": "plugin.extract_data.get_data_browser:fetch_from_browser",
+}
+
+_loaded: Dict[str, FetchFunc] = {}
+_lock = threading.Lock()
+
+def register_backend(name: str, target: str):
+    """register (or replace) a backend as "module:function", nothing is imported yet"""
+    with _lock:
+        BACKENDS[name] = target
+        _loaded.pop(name, None)
+
+def get_backend(name: str) -> FetchFunc:
+    """import the backend module on first use and return its fetch function"""
+    fetch = _loaded.get(name)
+    if fetch is not None:
+        return fetch
+    with _lock:
+        if name not in _loaded:
+            module_name, _, func_name = BACKENDS[name].partition(":")
+            _loaded[name] = getattr(importlib.import_module(module_name), func_name)
+        return _loaded[name]
+
+def page_url(config: BrowserConfig, page: int) -> str:
+    """URL of one listing page, also the key of the page cache"""
+    return update_url(url=config.base_url, query_params={"page": page})
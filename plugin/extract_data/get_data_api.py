@@ -1,20 +1,32 @@
+from typing import Optional
 import requests
 import time
 
 from configs.browser_config import BrowserConfig
-from core.utills import update_url
+from plugin.extract_data.backends import page_url
+from plugin.extract_data.http_cache import ResponseCache
 
-def fetch_from_api(config: BrowserConfig, page=1):
+def fetch_from_api(config: BrowserConfig, page=1, cache: Optional[ResponseCache] = None):
     """
     Fetch one page from API with retries, exponential backoff, and detailed error info.
+    With a cache, sends If-None-Match / If-Modified-Since and on 304 returns
+    the cached parsed page (same object every time) without reading the body.
     """
     backoff = config.retry_delay
     for attempt in range(1, config.max_retries + 1):
         try:
-            url = update_url(url=config.base_url, query_params={"page": page})
-            response = requests.get(url, timeout=config.timeout)
+            url = page_url(config, page)
+            headers = cache.validators(url) if cache else {}
+            response = requests.get(url, timeout=config.timeout, headers=headers)
+            if cache and response.status_code == 304:
+                entry = cache.get(url)
+                if entry:
+                    return entry["payload"]
             response.raise_for_status()
-            return response.json()
+            payload = response.json()
+            if cache:
+                cache.put(url, response.headers.get("ETag"), response.headers.get("Last-Modified"), payload)
+            return payload
         except requests.exceptions.Timeout as e:
             error_msg = f"Timeout on page {page}, attempt {attempt}: {e}"
         except requests.exceptions.ConnectionError as e:
@@ -1,7 +1,132 @@
-# 1/10
-from playwright.sync_api import sync_playwright
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, parse_qs
+import logging
+import threading
+import time
+
+from playwright.sync_api import sync_playwright, Error as PlaywrightError
 
 from configs.browser_config import BrowserConfig
+from plugin.extract_data.backends import page_url
+
+class BrowserSession:
+    """
+    One headless Chromium + one context + one tab, kept alive across pages and runs.
+    - Pages are read from the JSON API responses the browser receives
+      (request interception), never from the DOM.
+    - Images / fonts / CSS / media are aborted before they are downloaded.
+    - Playwright's sync API is bound to the thread that started it, so every
+      call runs on one dedicated thread; callers from any thread just wait.
+    """
+    def __init__(self, config: BrowserConfig):
+        self.logger = logging.getLogger(self.__class__.__name__)  # Logger per class
+        self.config = config
+        self.blocked = frozenset(config.browser_block_resources)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="browser")
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._page = None
+
+    def fetch(self, config: BrowserConfig, page: int) -> dict:
+        return self._executor.submit(self._fetch, config, page).result()
+
+    def close(self):
+        """stop the browser, the next fetch starts a new one"""
+        self._executor.submit(self._shutdown).result()
+
+    # ==============================
+    # Browser thread only
+    # ==============================
+    def _start(self):
+        if self._browser is not None and self._browser.is_connected():
+            return
+        self._shutdown()  # browser crashed or was never started
+        self._playwright = sync_playwright().start()
+        self._browser = self._playwright.chromium.launch(headless=self.config.browser_headless)
+        self._context = self._browser.new_context()
+        self._context.route("**/*", self._route)
+        self._page = self._context.new_page()
+        self.logger.info("Browser started")
+
+    def _route(self, route):
+        if route.request.resource_type in self.blocked:
+            route.abort()
+        else:
+            route.continue_()
+
+    def _shutdown(self):
+        for close in (getattr(self._context, "close", None),
+                      getattr(self._browser, "close", None),
+                      getattr(self._playwright, "stop", None)):
+            if close is None:
+                continue
+            try:
+                close()
+            except Exception:
+                pass  # already gone
+        self._playwright = self._browser = self._context = self._page = None
+
+    def _fetch(self, config: BrowserConfig, page: int) -> dict:
+        """
+        Open the page and return the JSON of the API response it triggers,
+        with retries and exponential backoff like the API backend.
+        """
+        api_url = page_url(config, page)
+        entry_url = config.browser_entry_url.format(page=page) if config.browser_entry_url else api_url
+        api = urlparse(api_url)
+        timeout_ms = config.timeout * 1000
+
+        def is_api_response(response) -> bool:
+            url = urlparse(response.url)
+            return ((url.netloc, url.path) == (api.netloc, api.path)
+                    and parse_qs(url.query).get("page") == [str(page)])
+
+        backoff = config.retry_delay
+        for attempt in range(1, config.max_retries + 1):
+            try:
+                self._start()
+                with self._page.expect_response(is_api_response, timeout=timeout_ms) as captured:
+                    self._page.goto(entry_url, wait_until="commit", timeout=timeout_ms)
+                response = captured.value
+                if not response.ok:
+                    raise PlaywrightError(f"HTTP {response.status} for {response.url}")
+                return response.json()
+            except PlaywrightError as e:
+                error_msg = f"Browser error on page {page}, attempt {attempt}: {e}"
+            except Exception as e:
+                error_msg = f"Unexpected error on page {page}, attempt {attempt}: {e}"
+
+            # retry
+            if attempt < config.max_retries:
+                time.sleep(backoff)
+                backoff *= 2  # backoff
+            else:
+                return {
+                    "error": "Browser fetch failed",
+                    "page": page,
+                    "attempts": attempt,
+                    "details": error_msg
+                }
+
+_session: Optional[BrowserSession] = None
+_session_lock = threading.Lock()
+
+def get_session(config: BrowserConfig) -> BrowserSession:
+    """
+    the process-wide browser session, the browser starts on the first fetch
+    (headless / blocked resources are taken from the first config)
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = BrowserSession(config)
+        return _session
 
-def fetch_from_browser(config: BrowserConfig):
-    return {"error": f"Browser fetch failed"}
\ No newline at end of file
+def fetch_from_browser(config: BrowserConfig, page=1):
+    """
+    Fetch one page through the shared headless browser.
+    Same result shape as fetch_from_api: parsed page dict or {"error": ...}.
+    """
+    return get_session(config).fetch(config, page)
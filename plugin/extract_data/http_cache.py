@@ -0,0 +1,93 @@
+from typing import Dict, Optional
+import hashlib
+import json
+import os
+import threading
+
+class ResponseCache:
+    """
+    On-disk HTTP validator cache for API pages, keyed by page URL.
+
+    Each entry keeps the ETag / Last-Modified validators, the parsed page and
+    the normalized row tuples built from it (per fields signature), so a
+    304 Not Modified answer costs neither a download nor a parse nor a
+    normalize. Parsed entries are kept in memory for the life of the process
+    and reloaded from `cache_dir` after a restart.
+    """
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self._entries: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, url: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                try:
+                    with open(self._path(url), "r", encoding="utf-8") as f:
+                        entry = json.load(f)
+                except (OSError, ValueError):
+                    return None
+                # JSON has no tuples, rows come back as lists
+                entry["normalized"] = {signature: [tuple(row) for row in rows]
+                                       for signature, rows in entry["normalized"].items()}
+                self._entries[url] = entry
+            return entry
+
+    def validators(self, url: str) -> dict:
+        """conditional request headers for url"""
+        entry = self.get(url)
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def put(self, url: str, etag: Optional[str], last_modified: Optional[str], payload: dict):
+        """store a fresh 200 answer (drops normalized items of the old payload)"""
+        if not etag and not last_modified:
+            return  # nothing to revalidate with
+        entry = {"etag": etag, "last_modified": last_modified, "payload": payload, "normalized": {}}
+        with self._lock:
+            self._entries[url] = entry
+            self._write(url, entry)
+
+    def get_normalized(self, url: str, payload: dict, signature: str) -> Optional[list]:
+        """normalized items, only if `payload` is the cached page object itself"""
+        entry = self.get(url)
+        if entry is None or entry["payload"] is not payload:
+            return None
+        return entry["normalized"].get(signature)
+
+    def put_normalized(self, url: str, payload: dict, signature: str, items: list):
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None or entry["payload"] is not payload:
+                return
+            entry["normalized"][signature] = items
+            self._write(url, entry)
+
+    def _write(self, url: str, entry: dict):
+        """atomic replace, a crash never leaves a half written entry (caller holds the lock)"""
+        path = self._path(url)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+_caches: Dict[str, ResponseCache] = {}
+_caches_lock = threading.Lock()
+
+def get_cache(cache_dir: str) -> ResponseCache:
+    """one shared ResponseCache per directory, so parsed pages survive between runs"""
+    with _caches_lock:
+        cache = _caches.get(cache_dir)
+        if cache is None:
+            cache = _caches[cache_dir] = ResponseCache(cache_dir)
+        return cache
@@ -1,24 +1,32 @@
-from typing import Optional
+from typing import Iterator, Optional
 
 from plugin.extract_data.process import DataExtractor
 from configs.browser_config import BrowserConfig
+from configs.typing_utils import ProgramIndex
 
 def get_extracet(debug: bool,
                  include_all: bool,
-                 config: BrowserConfig = BrowserConfig()) -> Optional[str]:
+                 config: Optional[BrowserConfig] = None,
+                 index: Optional[ProgramIndex] = None) -> Optional[str]:
     """
     Extract program data and format output.
 
     Parameters:
     - debug       : If True, print detailed logs with field names and counts.
     - include_all : If True, include archived/disabled/private programs.
-    - config      : BrowserConfig object defining fields to extract.
+    - config      : BrowserConfig object defining fields to extract (default: BrowserConfig()).
+    - index       : Per-program index for incremental extraction (None = full run).
 
     Returns:
     - str : Formatted output (JSON if error, CSV-like if normal, or debug log).
     """
-    extractor = DataExtractor(config=config, include_all=include_all)
-    results: Optional[list[Optional[dict]]] = extractor.extract()
+    config = config or BrowserConfig()
+    if not debug:
+        output = "\n".join(iter_extracet(include_all=include_all, config=config, index=index))
+        return output or None
+
+    extractor = DataExtractor(config=config, include_all=include_all, index=index)
+    results: Optional[list[tuple]] = extractor.extract()
 
     # Case 1: Error in results
     if results is None:
@@ -27,22 +35,27 @@ def get_extracet(debug: bool,
     field_names = list(config.fields.keys())
     output: list[str] = []
 
-    if debug:
-        # Debug mode: pretty print with numbering
-        output.append("\n==========================")
-        output.append(f"[📦] Finished! Total programs collected: {len(results)}")
-        output.append("==========================\n")
-
-        for idx, program in enumerate(results, start=1):
-            if program is not None:
-                values = [f"{field}: {program.get(field, '')}" for field in field_names]
-                output.append(f"{idx:02d}. " + " — ".join(values))
-    else:
-        # Normal mode: CSV-like pipeline
-        for program in results:
-            if program is not None:
+    # Debug mode: pretty print with numbering
+    output.append("\n==========================")
+    output.append(f"[📦] Finished! Total programs collected: {len(results)}")
+    output.append("==========================\n")
 
-                values = [str(program.get(field, "")) for field in field_names]
-                output.append(",".join(values))
+    for idx, program in enumerate(results, start=1):
+        values = [f"{field}: {value}" for field, value in zip(field_names, program)]
+        output.append(f"{idx:02d}. " + " — ".join(values))
 
     return "\n".join(output) if output else "ERROR finally"
+
+def iter_extracet(include_all: bool,
+                  config: Optional[BrowserConfig] = None,
+                  index: Optional[ProgramIndex] = None) -> Iterator[str]:
+    """
+    Streaming twin of get_extracet (normal mode): lazily yields one CSV-like
+    line per program, fetch -> filter -> normalize -> format, page by page.
+    Yields nothing when extraction failed.
+    """
+    extractor = DataExtractor(config=config or BrowserConfig(), include_all=include_all, index=index)
+
+    # rows are tuples in config.fields order
+    for program in extractor.iter_extract():
+        yield ",".join(map(str, program))
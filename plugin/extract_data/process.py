@@ -1,10 +1,15 @@
-from typing import Optional
-import time
-
-from plugin.extract_data.validate import validate_data
-from plugin.extract_data.get_data_api import fetch_from_api
-from plugin.extract_data.get_data_browser import fetch_from_browser
+from typing import Iterable, Iterator, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import json
+
+from plugin.extract_data.validate import compile_validator, get_invalid_data_log
+from plugin.extract_data.backends import get_backend, page_url
+from plugin.extract_data.http_cache import ResponseCache, get_cache
+from plugin.extract_data.projection import Row, compile_projector
 from configs.browser_config import BrowserConfig
+from configs.typing_utils import ProgramEntries, ProgramIndex
+from core.rate_limiter import TokenBucket
 
 # ==============================
 # Utility Functions
@@ -34,7 +39,10 @@ def is_active_bounty(item: dict):
     )
 
 def normalize_item(item, cfg_fields: dict):
-    """Normalize a single item based on config fields."""
+    """
+    Normalize a single item based on config fields.
+    Reference path, DataExtractor uses the compiled projector (projection.py) instead.
+    """
     entry = {}
     for field, spec in cfg_fields.items():
         entry[field] = extract_nested(item=item, path_list=spec["path"], default=spec["default"])
@@ -47,54 +55,190 @@ def normalize_item(item, cfg_fields: dict):
 class DataExtractor:
     def __init__(self, 
                  config: BrowserConfig, 
-                 include_all: bool=False):
-
+                 include_all: bool=False,
+                 cache: Optional[ResponseCache] = None,
+                 index: Optional[ProgramIndex] = None):
+        """
+        :param cache: HTTP validator cache (default: shared cache of config.cache_dir).
+        :param index: Per-program index, turns on incremental extraction:
+                      only items whose last_update_at moved are normalized again.
+        """
         self.config = config
         self.include_all = include_all
+        self.cache = cache or (get_cache(config.cache_dir) if config.use_http_cache else None)
+        self.index = index
+        # item -> row tuple in config.fields order, compiled once
+        self.project = compile_projector(config.fields)
+        self.validate = compile_validator(config.validation_rules, get_invalid_data_log(
+            config.invalid_log_dir,
+            max_files=config.invalid_log_max_files,
+            max_bytes=config.invalid_log_max_bytes,
+            min_interval=config.invalid_log_interval))
+        # normalized items cached per page are only valid for the same fields / filter / row format
+        self.signature = json.dumps([config.fields, include_all, "tuple"], sort_keys=True)
 
     def extract(self) -> Optional[list]:
+        return list(self.iter_extract()) or None
+
+    def iter_extract(self) -> Iterator[Row]:
+        """
+        Streaming extract: row tuples (config.fields order) are yielded page by page, so the
+        first rows are ready before the last page arrives.
+        Falls back to the browser only if the API produced no row at all.
+        """
         # try with API
-        api_data = self._fetch_all_pages(fetch_from_api)
-        if api_data:
-            return api_data
+        # backends are imported on first use (backends.py)
+        fetch_api = partial(get_backend("api"), cache=self.cache)
+        if self.index is not None:
+            api_rows = self._iter_incremental(fetch_api)
+        else:
+            api_rows = self._iter_all_pages(fetch_api, cached=True)
 
-        # try with browser
-        browser_data = self._fetch_all_pages(fetch_from_browser)
-        if browser_data:
-            return browser_data
+        produced = False
+        for row in api_rows:
+            produced = True
+            yield row
+        if produced:
+            return
 
-        # final ERRIR
-        return None
+        # try with browser
+        yield from self._iter_all_pages(get_backend("browser"))
 
-    def _fetch_all_pages(self, fetch_func) -> Optional[list]:
+    def _iter_pages(self, fetch_func, parallel: bool = True) -> Iterator[Tuple[int, dict]]:
+        """
+        Yield (page, raw_data) in page order.
+        - Page 1 tells how many pages exist (pagination.nb_pages).
+        - parallel=True: the remaining pages are fetched by up to `max_workers`
+          threads and still yielded in page order.
+        - Never faster than `requests_per_second`.
+        - Stops at the first invalid or empty page (later pages are dropped).
+        """
+        bucket = TokenBucket(rate=self.config.requests_per_second)
+
+        def fetch_page(page: int) -> Optional[dict]:
+            bucket.acquire()
+            return fetch_func(self.config, page=page)
+
+        first_page = fetch_page(1)
+        if not self._is_valid_page(first_page):
+            return
+        yield 1, first_page
+
+        nb_pages = first_page.get("pagination", {}).get("nb_pages", 1)
+        pages = range(2, nb_pages + 1)
+        if not parallel:
+            for page in pages:
+                raw_data = fetch_page(page)
+                if not self._is_valid_page(raw_data):
+                    return
+                yield page, raw_data
+            return
+
+        executor = ThreadPoolExecutor(max_workers=self.config.max_workers,
+                                      thread_name_prefix="fetch_page")
+        try:
+            # map() yields in page order, whatever order the pages finish in
+            for page, raw_data in zip(pages, executor.map(fetch_page, pages)):
+                if not self._is_valid_page(raw_data):
+                    break
+                yield page, raw_data
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _iter_all_pages(self, fetch_func, cached: bool = False) -> Iterator[Row]:
         """
         Fetch and normalize items across all pages using the given fetch function.
-        - Stops if data is invalid, empty, or no more pages.
-        - Respects rate limit between requests.
+        - cached=True: pages answered 304 reuse their normalized items.
         """
-        all_items = []
-        page = 1
-
-        while True:
-            raw_data: Optional[dict] = fetch_func(self.config, page=page)
-            if not raw_data or not validate_data(data=raw_data, rules=self.config.validation_rules):
-                break
-
-            items = raw_data.get("items") or []
-            if not items:
+        cache = self.cache if cached else None
+        for page, raw_data in self._iter_pages(fetch_func):
+            yield from self._process_items(raw_data, page, cache)
+
+    def _is_valid_page(self, raw_data: Optional[dict]) -> bool:
+        if not raw_data or not self.validate(raw_data):
+            return False
+        return bool(raw_data.get("items"))
+
+    def _process_items(self, raw_data: dict, page: int, cache: Optional[ResponseCache] = None) -> list:
+        url = page_url(self.config, page) if cache else None
+        if cache:
+            items = cache.get_normalized(url, raw_data, self.signature)
+            if items is not None:
+                return items
+
+        project = self.project
+        items = [
+            project(item)
+            for item in raw_data.get("items") or []
+            if self.include_all or is_active_bounty(item)
+        ]
+        if cache:
+            cache.put_normalized(url, raw_data, self.signature, items)
+        return items
+
+    # ==============================
+    # Incremental mode
+    # ==============================
+    def _iter_incremental(self, fetch_func) -> Iterator[Row]:
+        """
+        Same snapshot as a full run, but only new / updated items are normalized.
+        With config.sorted_by_update (API sorted newest first) pagination stops
+        at the first page without changes, the rest comes from the index when
+        the counts prove nothing was removed (pagination.nb_results).
+        The index is saved once the last row has been consumed.
+        """
+        known = self.index.load()
+        entries: ProgramEntries = {}
+        complete = False
+        fresh = 0
+
+        for page, raw_data in self._iter_pages(fetch_func, parallel=not self.config.sorted_by_update):
+            page_fresh, page_entries = self._index_items(raw_data.get("items") or [], known, entries)
+            fresh += page_fresh
+            yield from self._active_rows(page_entries)
+
+            pagination = raw_data.get("pagination", {})
+            if page >= pagination.get("nb_pages", 1):
+                complete = True  # walked the whole catalogue
                 break
 
-            # Process items
-            for item in items:
-                if self.include_all or is_active_bounty(item):
-                    all_items.append(normalize_item(item, self.config.fields))
+            if self.config.sorted_by_update and page_fresh == 0:
+                rest = [(identity, entry) for identity, entry in known.items() if identity not in entries]
+                if len(entries) + len(rest) == pagination.get("nb_results"):
+                    entries.update(rest)
+                    yield from self._active_rows(entry for _, entry in rest)
+                    break
 
-            # Pagination check
-            nb_pages = raw_data.get("pagination", {}).get("nb_pages", 1)
-            if page >= nb_pages:
-                break
+        if entries and (fresh or list(entries) != list(known)):
+            self.index.save(entries, complete=complete)
 
-            page += 1
-            time.sleep(self.config.rate_limit)
+    def _active_rows(self, entries: Iterable[tuple]) -> Iterator[Row]:
+        for _, active, row in entries:
+            if self.include_all or active:
+                yield row
 
-        return all_items or None
+    def _index_items(self, items: list, known: ProgramEntries, entries: ProgramEntries) -> Tuple[int, list]:
+        """
+        reuse index rows whose last_update_at did not move; is_active_bounty is
+        evaluated on every run (archiving or going private may not bump
+        last_update_at)
+        :return: (how many were (re)normalized or changed state, entries of these items)
+        """
+        identity_spec = self.config.fields[self.config.identity_field]
+        version_spec = self.config.fields[self.config.version_field]
+        fresh = 0
+        page_entries = []
+        for item in items:
+            identity = extract_nested(item, identity_spec["path"], identity_spec["default"])
+            version = extract_nested(item, version_spec["path"], version_spec["default"])
+            active = bool(is_active_bounty(item))
+            entry = known.get(identity)
+            if entry is None or entry[0] != version:
+                entry = (version, active, self.project(item))
+                fresh += 1
+            elif entry[1] != active:
+                entry = (version, active, entry[2])  # only the projected row is reused
+                fresh += 1
+            entries[identity] = entry
+            page_entries.append(entry)
+        return fresh, page_entries
@@ -0,0 +1,71 @@
+from typing import Any, Callable, Dict, Tuple
+
+# ==============================
+# Compiled field projection
+# ==============================
+# BrowserConfig.fields is compiled once into one getter per field (a closure
+# over its path and default) and a function returning a row tuple in fields order.
+# Same semantics as process.extract_nested: a missing key or a non-dict on the
+# way gives the default, and {} / None / "" results are replaced by the default.
+
+Row = Tuple[Any, ...]
+_EMPTY = ({}, None, "")
+_MISSING = object()
+
+def _field_getter(path: list, default: Any) -> Callable[[dict], Any]:
+    """dict item -> value of one field"""
+    if not path:
+        return lambda item: item if item not in _EMPTY else default
+
+    if len(path) == 1:
+        key = path[0]
+
+        def get_key(item: dict) -> Any:
+            value = item.get(key)  # missing -> None, which is empty anyway
+            return default if value in _EMPTY else value
+        return get_key
+
+    first, rest = path[0], tuple(path[1:])
+
+    def get_path(item: dict) -> Any:
+        value = item.get(first, _MISSING)
+        for key in rest:
+            if not isinstance(value, dict):
+                return default
+            value = value.get(key, _MISSING)
+        return default if value is _MISSING or value in _EMPTY else value
+    return get_path
+
+def compile_projector(cfg_fields: Dict[str, dict]) -> Callable[[dict], Row]:
+    """
+    Compile config fields into `project(item) -> tuple`.
+
+    >>> project = compile_projector({"title": {"path": ["title"], "default": "N/A"}})
+    >>> project({"title": "x"}), project({})
+    (('x',), ('N/A',))
+    """
+    specs = [(list(spec["path"]), spec["default"]) for spec in cfg_fields.values()]
+
+    def project_other(item: Any) -> Row:
+        # not a dict: only path-less fields can read it
+        return tuple([item if not path and item not in _EMPTY else default for path, default in specs])
+
+    if all(len(path) == 1 for path, _ in specs):
+        # flat fields (the usual config): one C-level map over dict.get, no call per field
+        keys = tuple(path[0] for path, _ in specs)
+        defaults = tuple(default for _, default in specs)
+
+        def project_flat(item: dict) -> Row:
+            if not isinstance(item, dict):
+                return project_other(item)
+            return tuple([default if value in _EMPTY else value
+                          for value, default in zip(map(item.get, keys), defaults)])
+        return project_flat
+
+    getters = tuple(_field_getter(path, default) for path, default in specs)
+
+    def project(item: dict) -> Row:
+        if not isinstance(item, dict):
+            return project_other(item)
+        return tuple([get(item) for get in getters])
+    return project
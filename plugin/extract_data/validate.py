@@ -1,69 +1,185 @@
+from typing import Any, Callable, Dict, Optional, Tuple
+import datetime
+import itertools
 import json
+import logging
 import os
-import datetime
+import queue
+import threading
+import time
 
-def validate_data(data, rules, debug_log_dir="logs"):
+Validator = Callable[[Any], bool]
+Failure = Tuple[str, Optional[int]]  # (message, item_index)
+
+def compile_validator(rules: list, failure_log: Optional["InvalidDataLog"] = None) -> Validator:
     """
-    Validate that required keys exist in data.
-    Supports nested keys with dot notation (e.g. 'items.title').
-    Logs errors into a file instead of printing.
+    Compile validation rules once into `validate(data) -> bool`.
+    Supports nested keys with dot notation (e.g. 'items.title'); when a list is
+    met on the way, every element must hold the rest of the path.
+    The first failure is handed to `failure_log` (never blocks on disk I/O).
     """
-    if not isinstance(data, dict):
-        _log_invalid_data(data, "Data is not a dictionary", None, debug_log_dir)
+    paths = [(rule.get("key"), tuple(rule.get("key").split("."))) for rule in rules]
+
+    def validate(data) -> bool:
+        if not isinstance(data, dict):
+            failure = ("Data is not a dictionary", None)
+        else:
+            failure = None
+            for path, keys in paths:
+                failure = _check_path(data, path, keys)
+                if failure is not None:
+                    break
+
+        if failure is None:
+            return True
+        if failure_log is not None:
+            message, item_index = failure
+            failure_log.capture(data, message, item_index)
         return False
 
-    for rule in rules:
-        path = rule.get("key")
-        keys = path.split(".")
-
-        # Traverse path
-        value = data
-        for i, key in enumerate(keys):
-            if isinstance(value, dict):
-                value = value.get(key)
-            elif isinstance(value, list):
-                # If we hit a list, check each element
-                for idx, element in enumerate(value):
-                    sub_path = ".".join(keys[i+1:])
-                    sub_rule = {"key": sub_path}
-                    if not validate_data(element, [sub_rule], debug_log_dir):
-                        _log_invalid_data(
-                            element,
-                            f"Missing key '{sub_path}' in list element.",
-                            idx,
-                            debug_log_dir
-                        )
-                        return False
-                value = None  # handled by recursion
-                break
-            else:
-                value = None
-                break
-
-        # Final check
-        if value is None or value == {} or value == "":
-            _log_invalid_data(
-                data,
-                f"Missing key '{path}'.",
-                None,
-                debug_log_dir
-            )
+    return validate
+
+def _check_path(data: dict, path: str, keys: tuple) -> Optional[Failure]:
+    value = data
+    for i, key in enumerate(keys):
+        if isinstance(value, dict):
+            value = value.get(key)
+        elif isinstance(value, list):
+            # If we hit a list, check each element against the rest of the path
+            sub_path = ".".join(keys[i:])
+            for idx, element in enumerate(value):
+                if not isinstance(element, dict) or _check_path(element, sub_path, keys[i:]) is not None:
+                    return f"Missing key '{sub_path}' in list element.", idx
+            return None
+        else:
+            value = None
+            break
+
+    # Final check
+    if value is None or value == {} or value == "":
+        return f"Missing key '{path}'.", None
+    return None
+
+class InvalidDataLog:
+    """
+    Bounded, asynchronous capture of payloads that failed validation.
+    - Sampling : at most one capture per `min_interval` seconds, the rest are counted.
+    - Bounded  : a small queue, captures are dropped when the writer falls behind.
+    - Size cap : payloads larger than `max_bytes` are stored truncated.
+    - Rotation : only the newest `max_files` files are kept in `log_dir`.
+    Files are written by one daemon thread, so validation never waits on the disk.
+    """
+    PREFIX = "invalid_data_"
+
+    def __init__(self, log_dir: str, max_files: int = 20, max_bytes: int = 256 * 1024,
+                 min_interval: float = 60.0, queue_size: int = 4):
+        self.logger = logging.getLogger(self.__class__.__name__)  # Logger per class
+        self.log_dir = log_dir
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.min_interval = min_interval
+        self._queue: "queue.Queue[dict]" = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._last_capture = float("-inf")
+        self._suppressed = 0
+        self._sequence = itertools.count(1)
+        self._worker: Optional[threading.Thread] = None
+
+    def capture(self, data, message: str, item_index: Optional[int] = None) -> bool:
+        """
+        queue one failure for writing (the payload is serialized later, it must not be mutated)
+        :return: True if queued, False if sampled out or dropped.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_capture < self.min_interval:
+                self._suppressed += 1
+                return False
+            self._last_capture = now
+            suppressed, self._suppressed = self._suppressed, 0
+            self._ensure_worker()
+
+        entry = {
+            "error": message,
+            "item_index": item_index,
+            "time": datetime.datetime.utcnow().isoformat(),
+            "suppressed_since_last": suppressed,
+            "data": data,
+        }
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            with self._lock:
+                self._suppressed += 1  # reported with the next capture
             return False
+        return True
+
+    def flush(self, timeout: Optional[float] = None):
+        """wait until every queued capture is on disk (tests / shutdown)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return
+            time.sleep(0.01)
+
+    def _ensure_worker(self):
+        """start the writer thread on first capture (caller holds self._lock)"""
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="invalid_data_log", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            entry = self._queue.get()
+            try:
+                self._write(entry)
+                self._rotate()
+            except Exception as e:
+                self.logger.warning(f"Could not write invalid data log: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, entry: dict):
+        data = json.dumps(entry.pop("data"), ensure_ascii=False, separators=(",", ":"), default=str)
+        if len(data) > self.max_bytes:
+            entry["data_truncated"] = {"size": len(data), "head": data[:self.max_bytes]}
+        else:
+            entry["data"] = json.loads(data)
 
-    return True
+        os.makedirs(self.log_dir, exist_ok=True)
+        timestamp = datetime.datetime.utcnow().strftime("%Y%m%d_%H%M%S_%f")
+        # sequence keeps names unique, several failures in one second no longer overwrite each other
+        log_file = os.path.join(self.log_dir, f"{self.PREFIX}{timestamp}_{next(self._sequence):04d}.json")
+        with open(log_file, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False, separators=(",", ":"))
 
+    def _rotate(self):
+        files = sorted(name for name in os.listdir(self.log_dir)
+                       if name.startswith(self.PREFIX) and name.endswith(".json"))
+        for name in files[:max(0, len(files) - self.max_files)]:
+            os.remove(os.path.join(self.log_dir, name))
 
-def _log_invalid_data(data, message, item_index, debug_log_dir):
-    """Helper to log invalid data into a file for debugging."""
-    os.makedirs(debug_log_dir, exist_ok=True)
-    timestamp = datetime.datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    log_file = os.path.join(debug_log_dir, f"invalid_data_{timestamp}.json")
+_logs: Dict[str, InvalidDataLog] = {}
+_logs_lock = threading.Lock()
 
-    log_entry = {
-        "error": message,
-        "item_index": item_index,
-        "data": data
-    }
+def get_invalid_data_log(log_dir: str, **options) -> InvalidDataLog:
+    """one shared InvalidDataLog per directory (options apply when it is first created)"""
+    with _logs_lock:
+        failure_log = _logs.get(log_dir)
+        if failure_log is None:
+            failure_log = _logs[log_dir] = InvalidDataLog(log_dir, **options)
+        return failure_log
 
-    with open(log_file, "w", encoding="utf-8") as f:
-        json.dump(log_entry, f, indent=2, ensure_ascii=False)
+_validators: Dict[Tuple[str, str], Validator] = {}
+
+def validate_data(data, rules, debug_log_dir="logs"):
+    """
+    Validate that required keys exist in data.
+    Supports nested keys with dot notation (e.g. 'items.title').
+    Compatibility wrapper, hot paths keep their own compile_validator() result.
+    """
+    key = (json.dumps(rules, sort_keys=True), debug_log_dir)
+    validator = _validators.get(key)
+    if validator is None:
+        validator = _validators[key] = compile_validator(rules, get_invalid_data_log(debug_log_dir))
+    return validator(data)
@@ -1,9 +1,27 @@
 # most edit here
+from typing import Dict, List, Optional, Tuple, Union
 import difflib
 import re
 
-def diff_to_dict(first: str, second: str) -> dict:
-    """Return dict with keys: removed, added, common"""
+from configs.browser_config import BrowserConfig
+from configs.typing_utils import UserFlag, flags_to_mask
+
+def diff_to_dict(first: str,
+                 second: str,
+                 mode: str = "ndiff",
+                 fields: Optional[List[str]] = None,
+                 key: Optional[str] = None) -> dict:
+    """
+    Return dict with keys: removed, added, common (+ changed in keyed mode)
+
+    mode "ndiff" : line diff with difflib.ndiff (order sensitive).
+    mode "keyed" : hash join on the `key` column of `fields` (BrowserConfig.fields order), see diff_keyed.
+                   key defaults to BrowserConfig.identity_field.
+    """
+    if mode == "keyed":
+        key = key or BrowserConfig().identity_field
+        return diff_keyed(first=first, second=second, fields=fields or [key], key=key)
+
     lines_first = first.strip().splitlines()
     lines_second = second.strip().splitlines()
 
@@ -26,6 +44,62 @@ def diff_to_dict(first: str, second: str) -> dict:
 
     return result
 
+def _index_rows(lines: List[str], n_fields: int, key_idx: int) -> Dict[Tuple[str, int], str]:
+    """
+    Map (identity, occurrence) -> line keeping the input order.
+    Rows are split from the right, so commas inside the first column (title) survive.
+    """
+    rows = {}
+    seen: Dict[str, int] = {}
+    for line in lines:
+        parts = line.rsplit(",", n_fields - 1)
+        identity = parts[key_idx] if key_idx < len(parts) else line
+
+        occurrence = seen.get(identity, 0)
+        seen[identity] = occurrence + 1
+        rows[(identity, occurrence)] = line
+    return rows
+
+def diff_keyed(first: str,
+               second: str,
+               fields: List[str],
+               key: str) -> dict:
+    """
+    O(n) diff of two CSV-like snapshots keyed on program identity.
+
+    Same direction as the ndiff mode: "removed" holds rows only in `first`,
+    "added" rows only in `second`. A row present in both is "common" when it
+    is identical and "changed" when another column moved (e.g. last_update_at);
+    changed rows are reported as they appear in `first`.
+    Reordering rows never produces removed/added noise.
+    """
+    key_idx = fields.index(key)
+
+    rows_first = _index_rows(first.strip().splitlines(), len(fields), key_idx)
+    rows_second = _index_rows(second.strip().splitlines(), len(fields), key_idx)
+
+    result = {
+        "removed": [],
+        "added": [],
+        "common": [],
+        "changed": []
+    }
+
+    for identity, line in rows_first.items():
+        other = rows_second.get(identity)
+        if other is None:
+            result["removed"].append(line)
+        elif other == line:
+            result["common"].append(line)
+        else:
+            result["changed"].append(line)
+
+    for identity, line in rows_second.items():
+        if identity not in rows_first:
+            result["added"].append(line)
+
+    return result
+
 def truncate(text: str, limit: int = 15) -> str:
     """
     Truncate text to the nearest break at or before `limit`.
@@ -53,20 +127,24 @@ def truncate(text: str, limit: int = 15) -> str:
     return result
 
 
-def build_message_custom(user_data: str, message: dict) -> str:
+def build_message_custom(user_data: Union[int, str], message: dict) -> str:
+    """
+    :param user_data: UserFlag mask of the audience (a legacy "1010" flags string is accepted too).
+    """
     output_lines = []
+    user_mask = flags_to_mask(user_data)
 
-    if len(user_data) > 3:
-        user_data = user_data[-3:]
-
+    # "changed" (keyed diff only) used to show up as removed + added with ndiff,
+    # so it follows either of those two flags
     mapping = [
-        {"key": "removed", "id": 0, "icon": "🔴", "parametr": None},
-        {"key": "added",   "id": 1, "icon": "🟢", "parametr": None},
-        {"key": "common",  "id": 2, "icon": "🔵", "parametr": None}
+        {"key": "removed", "mask": UserFlag.REMOVED,                 "icon": "🔴", "parametr": None},
+        {"key": "added",   "mask": UserFlag.ADDED,                   "icon": "🟢", "parametr": None},
+        {"key": "changed", "mask": UserFlag.REMOVED | UserFlag.ADDED, "icon": "🟡", "parametr": None},
+        {"key": "common",  "mask": UserFlag.COMMON,                  "icon": "🔵", "parametr": None}
         ]
 
     for idx, item in enumerate(mapping):
-        if user_data[item["id"]] == "1":
+        if user_mask & item["mask"]:
             if message.get(item["key"], None):
                 icon = item["icon"]
                 lable = item["key"]